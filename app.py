@@ -1,20 +1,34 @@
 
+import streamlit as st
+import pickle
+import os
+os.environ["STREAMLIT_SERVER_FILE_WATCHER_TYPE"] = "none"
+
+# With PLANTMATCH_SERVICE_URL set (e.g. http://127.0.0.1:8000) retrieval,
+# recommendations and disease lookups go to the HTTP service
+# (service.py) and no models are loaded in this process
+SERVICE_URL = os.environ.get("PLANTMATCH_SERVICE_URL")
+
 # ----------------------------------
 # RAG Imports
 # ----------------------------------
-from rag.retriever import retrieve
-from rag.prompt_builder import build_context, build_prompt
+from rag.prompt_builder import warm_snippets
 # from rag.generator import generate, generate_answer
 from rag.generator import generate_answer
+from rag.llm_pool import LLMPool
+from rag.answer_cache import AnswerCache
 
 from rag.safety import apply_safety
+from rag.client import ServiceClient
+from rag.shared import SHARED_DIR, bundle_path
 
-import streamlit as st
-import json
-import pandas as pd
-import pickle
-import os
-os.environ["STREAMLIT_SERVER_FILE_WATCHER_TYPE"] = "none"
+if not SERVICE_URL:
+    from rag.retriever import retrieve
+    from rag.corpus import load_corpus
+    from ml.forest import load_compiled_forest
+    from ml.state_table import load_state_table
+    from ml.disease_index import load_disease_index
+    from rag.embedding_store import file_hash
 
 
 # ----------------------------------
@@ -43,38 +57,133 @@ mode = st.sidebar.radio(
 # ----------------------------------
 # Load Core Dataset
 # ----------------------------------
-@st.cache_data
+DATA_FILE = "/home/kailas/Desktop/new_med_leaf/data/plant_ai_dataset_v2_native_state.json"
+PLANT_MODEL_FILE = "/home/kailas/Desktop/new_med_leaf/data/plant_recommendation_model.pkl"
+# Compiled artifacts (corpus columns, forest, tables); shared between
+# workers when PLANTMATCH_SHARED_DIR is set
+COMPILED_DIR = SHARED_DIR or "/home/kailas/Desktop/new_med_leaf/data/compiled"
+# Generated answers, kept across restarts (rag/answer_cache.py)
+ANSWER_CACHE_FILE = os.path.join(COMPILED_DIR, "answer_cache.sqlite")
+
+# Columnar, memory-mapped corpus (rag/corpus.py), recompiled from
+# DATA_FILE whenever the JSON changes
+@st.cache_resource
 def load_data():
-    with open("/home/kailas/Desktop/new_med_leaf/data/plant_ai_dataset_v2_native_state.json", "r", encoding="utf-8") as f:
-        return pd.DataFrame(json.load(f))
-
-df = load_data()
+    corpus = load_corpus(DATA_FILE, COMPILED_DIR)
+    # Token-counted prompt snippets per plant (rag/prompt_builder.py)
+    warm_snippets(corpus)
+    return corpus
 
 # ----------------------------------
 # Load Plant Recommendation Model
 # ----------------------------------
+# Compiled array-backed forest (python -m ml.forest export ...); loads
+# memory-mapped and is shared between workers. Falls back to the pickle.
 @st.cache_resource
 def load_plant_model():
-    with open("/home/kailas/Desktop/new_med_leaf/data/plant_recommendation_model.pkl", "rb") as f:
+    if bundle_path(COMPILED_DIR, "forest"):
+        forest = load_compiled_forest(COMPILED_DIR)
+        return {
+            "model": forest,
+            "plant_type_encoder": forest.plant_type_encoder,
+            "climate_zone_encoder": forest.climate_zone_encoder
+        }
+
+    with open(PLANT_MODEL_FILE, "rb") as f:
         return pickle.load(f)
 
-plant_bundle = load_plant_model()
-plant_model = plant_bundle["model"]
-plant_encoder = plant_bundle["plant_type_encoder"]
-climate_encoder = plant_bundle["climate_zone_encoder"]
+# ----------------------------------
+# Per-state Recommendation Table
+# ----------------------------------
+# Step 5 inputs are static dataset columns, so every state's ranking is
+# precomputed; the table is rebuilt when the dataset or model changes.
+@st.cache_resource
+def load_recommendations():
+    # A compiled forest is identified by its own version (pickle hash +
+    # export options), so re-exporting with other options rebuilds the table
+    if hasattr(plant_model, "meta"):
+        model_hash = plant_model.meta["version"]
+    else:
+        model_hash = file_hash(PLANT_MODEL_FILE)
+
+    return load_state_table(
+        COMPILED_DIR, corpus, corpus.version, model_hash,
+        plant_model, plant_encoder, climate_encoder
+    )
 
 # ----------------------------------
-# Load Disease Model
+# Load Disease Index
 # ----------------------------------
+# Precomputed disease -> ranked plants lookup, rebuilt when the source
+# file changes (replaces the disease classifier)
 @st.cache_resource
-def load_disease_model():
-    with open("/home/kailas/Desktop/new_med_leaf/data/disease_support_model.pkl", "rb") as f:
-        return pickle.load(f)
+def load_diseases():
+    return load_disease_index(
+        "/home/kailas/Desktop/new_med_leaf/data/plant_disease_support.json",
+        COMPILED_DIR
+    )
+
+# One pool of LLM workers per server process, shared by all sessions
+@st.cache_resource
+def load_llm_pool():
+    return LLMPool()
+
+@st.cache_resource
+def load_service():
+    return ServiceClient(SERVICE_URL)
+
+# Change only on a redeploy; no HTTP calls on every rerun
+@st.cache_data(ttl=300)
+def service_version():
+    return load_service().version()
 
-disease_bundle = load_disease_model()
-disease_model = disease_bundle["model"]
-disease_encoder = disease_bundle["disease_encoder"]
-disease_df = disease_bundle["reference_df"]
+@st.cache_data(ttl=300)
+def service_states():
+    return load_service().states()
+
+@st.cache_data(ttl=300)
+def service_diseases():
+    return load_service().diseases()
+
+# Cleared of old answers whenever the corpus or the templates change
+@st.cache_resource
+def load_answer_cache(corpus_version):
+    return AnswerCache(ANSWER_CACHE_FILE, corpus_version)
+
+# ----------------------------------
+# Backend: HTTP service or local models
+# ----------------------------------
+if SERVICE_URL:
+    service = load_service()
+
+    # No query embedding over HTTP; the answer cache uses the word-set key alone
+    def retrieve(with_embedding=False, **kwargs):
+        plants = service.retrieve(**kwargs)
+        return (plants, None) if with_embedding else plants
+
+    top_plants = service.recommend
+    disease_plants = service.disease
+    state_names = service_states()
+    disease_names = service_diseases()
+    answers = load_answer_cache(service_version())
+else:
+    corpus = load_data()
+
+    plant_bundle = load_plant_model()
+    plant_model = plant_bundle["model"]
+    plant_encoder = plant_bundle["plant_type_encoder"]
+    climate_encoder = plant_bundle["climate_zone_encoder"]
+
+    recommendations = load_recommendations()
+    disease_index = load_diseases()
+
+    def top_plants(state, n=5):
+        return [{**corpus[row], "ml_score": score} for row, score in recommendations.top(state, n)]
+
+    disease_plants = disease_index.lookup
+    state_names = corpus.states
+    disease_names = disease_index.diseases()
+    answers = load_answer_cache(corpus.version)
 
 # ============================================================
 # 🏡 MODE 1 — HOME & BIODIVERSITY (Existing Flow)
@@ -105,8 +214,7 @@ if mode == "🏡 Home & Biodiversity Plants":
 
     # STEP 1 – Location
     elif st.session_state.step == 1:
-        states = sorted({s for states in df["suitable_states"].dropna() for s in states})
-        state = st.selectbox("📍 Your state", states)
+        state = st.selectbox("📍 Your state", state_names)
         st.session_state.answers["state"] = state
         st.session_state.score += 5
         if st.button("Next 👉"):
@@ -153,28 +261,7 @@ if mode == "🏡 Home & Biodiversity Plants":
 
         state = st.session_state.answers["state"]
 
-        candidates = df[
-            df["suitable_states"].apply(
-                lambda x: state in x if isinstance(x, list) else False
-            )
-        ].copy()
-
-        candidates["is_native"] = (candidates["origin_type"] == "native").astype(int)
-        candidates["carbon_score"] = candidates["carbon_score"].fillna(0)
-        candidates["plant_type"] = candidates["plant_type"].fillna("unknown")
-        candidates["climate_zone"] = candidates["climate_zone"].fillna("unknown")
-
-        candidates["plant_type_enc"] = plant_encoder.transform(candidates["plant_type"])
-        candidates["climate_zone_enc"] = climate_encoder.transform(candidates["climate_zone"])
-
-        X = candidates[[
-            "is_native", "carbon_score",
-            "plant_type_enc", "climate_zone_enc"
-        ]]
-
-        candidates["ml_score"] = plant_model.predict(X)
-
-        for _, row in candidates.sort_values("ml_score", ascending=False).head(5).iterrows():
+        for row in top_plants(state, 5):
             st.markdown(f"""
             ### 🌿 {row['plant_name']}
             - Common name: {row['common_name']}
@@ -207,41 +294,75 @@ elif mode == "🧠 AI Plant Expert (RAG)":
     query = st.text_input("💬 Ask your question")
 
     # State filter
-    all_states = sorted({
-        s for states in df["suitable_states"].dropna() for s in states
-    })
-    state = st.selectbox("📍 Filter by state (optional)", ["Any"] + all_states)
+    state = st.selectbox("📍 Filter by state (optional)", ["Any"] + state_names)
 
     native_only = st.checkbox("🌱 Prefer native plants only", value=True)
 
     top_k = st.slider("🔎 Number of plants to consider", 1, 4, 2)
 
+    use_llm = st.checkbox("🤖 Write the answer with the local model (Ollama)", value=False)
+
+    # Queue depth / wait histograms and fallback counts, for operators
+    if use_llm:
+        with st.sidebar.expander("🤖 LLM worker pool"):
+            st.json(load_llm_pool().stats())
+
 
     #top_k = st.slider("🔎 Number of plants to consider", 3, 8, 5)
 
     if st.button("Ask AI 🌿") and query:
 
         with st.spinner("🔍 Retrieving plant knowledge..."):
-            plants = retrieve(
+            plants, embedding = retrieve(
                 query=query,
                 top_k=top_k,
                 state=None if state == "Any" else state,
-                native_only=native_only
+                native_only=native_only,
+                with_embedding=True
             )
 
         if not plants:
             st.warning("No matching plants found. Try adjusting filters.")
         else:
-            with st.spinner("🧠 Generating grounded answer..."):
-                # context = build_context(plants)
-                # prompt = build_prompt(query, context)
-                # answer = generate(prompt)
-                # answer = apply_safety(answer)
-                answer = generate_answer(query, plants)
-                answer = apply_safety(answer)
+            # Same plants + same (or near-identical) question -> cached
+            # model answer. Template answers are cheap and quote the
+            # question, so they are never cached.
+            cached = answers.get("llm", query, plants, embedding) if use_llm else None
+
+            if cached is not None:
+                st.markdown("### 🌿 AI Answer")
+                st.markdown(apply_safety(cached))
+                st.caption("Answer reused from the cache")
+            elif use_llm:
+                # Tokens are shown as they arrive; a rerun (any click)
+                # closes the stream, which cancels the generation. A busy
+                # or slow model falls back to the template answer.
+                job = load_llm_pool().submit(query, plants)
 
                 st.markdown("### 🌿 AI Answer")
-                st.markdown(answer)
+                answer = st.write_stream(job)
+                st.markdown(apply_safety(""))
+                if job.source == "model":
+                    answers.put("llm", query, plants, answer, embedding)
+
+                if job.source == "template":
+                    st.caption(f"Template answer ({job.reason})")
+                elif job.stats.get("ttft") is not None:
+                    st.caption(
+                        f"First token after {job.stats['ttft']:.2f} s • "
+                        f"{job.stats['tokens']} tokens in {job.stats['total']:.2f} s"
+                    )
+            else:
+                with st.spinner("🧠 Generating grounded answer..."):
+                    # context = build_context(plants)
+                    # prompt = build_prompt(query, context)
+                    # answer = generate(prompt)
+                    # answer = apply_safety(answer)
+                    answer = generate_answer(query, plants)
+                    answer = apply_safety(answer)
+
+                    st.markdown("### 🌿 AI Answer")
+                    st.markdown(answer)
 
             # Optional: Show sources
             with st.expander("🔎 Plants used for this answer"):
@@ -264,23 +385,16 @@ else:
 
     disease = st.selectbox(
         "Select a common health concern",
-        sorted(disease_df["disease"].unique())
+        disease_names
     )
 
     if disease:
         st.subheader("🌿 Plants traditionally used")
 
-        enc = disease_encoder.transform([disease])[0]
-        predicted = disease_model.predict([[enc]])
-
-        results = disease_df[
-            disease_df["plant_name"].isin(predicted)
-        ].drop_duplicates("plant_name").head(6)
-
-        for _, row in results.iterrows():
+        for row in disease_plants(disease, limit=6):
             st.markdown(f"""
             ### 🌿 {row['plant_name']}
-            - Part used: {row['plant_part']}
+            - Part used: {', '.join(row['plant_parts']) or row['plant_part']}
             - Family: {row['family']}
             """)
 
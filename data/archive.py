@@ -0,0 +1,148 @@
+"""
+Content-addressed archive of raw HTTP responses for the scrapers.
+
+Every fetched payload (NITM detail HTML, MediaWiki API JSON) is stored
+gzip-compressed so parsers can be re-run offline without a re-crawl:
+
+    <folder>/
+        index.jsonl        one line per stored response:
+                           {"key", "sha256", "shard", "offset", "size", "fetched_at", ...}
+        shard-00000.gz     concatenated gzip members, one per distinct body
+        shard-00001.gz     (a new shard starts past SHARD_BYTES)
+
+Bodies are addressed by their sha256, so identical responses are stored
+once. `key` identifies the request (see request_key); re-fetching a key
+appends a new index line and the latest one wins.
+
+One process writes at a time (threads are fine); any number of
+processes can read.
+
+    python archive.py stats raw_archive
+"""
+import gzip
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from urllib.parse import urlencode
+
+ARCHIVE_DIR = "raw_archive"
+SHARD_BYTES = 256 * 1024 * 1024
+INDEX_FILE = "index.jsonl"
+
+
+def request_key(method, url, params=None):
+    """Stable key for a request: method, url and sorted parameters."""
+    key = f"{method.upper()} {url}"
+    if params:
+        key += "?" + urlencode(sorted((str(k), str(v)) for k, v in dict(params).items()))
+    return key
+
+
+class ResponseArchive:
+    def __init__(self, folder=ARCHIVE_DIR, readonly=False):
+        self.folder = folder
+        self.readonly = readonly
+        self.lock = threading.Lock()
+        self.entries = {}      # key -> latest index entry
+        self.blobs = {}        # sha256 -> (shard, offset, size)
+        self.shard = 0
+
+        if not readonly:
+            os.makedirs(folder, exist_ok=True)
+
+        index_path = os.path.join(folder, INDEX_FILE)
+        if os.path.exists(index_path):
+            with open(index_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        e = json.loads(line)
+                    except ValueError:
+                        continue   # partial line from an interrupted write
+                    self.entries[e["key"]] = e
+                    self.blobs[e["sha256"]] = (e["shard"], e["offset"], e["size"])
+                    self.shard = max(self.shard, e["shard"])
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def _shard_path(self, shard):
+        return os.path.join(self.folder, f"shard-{shard:05d}.gz")
+
+    def put(self, key, body, **meta):
+        """Store `body` (bytes or str) under `key`. Returns the index entry."""
+        if self.readonly:
+            raise RuntimeError("archive opened read-only")
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        sha = hashlib.sha256(body).hexdigest()
+
+        with self.lock:
+            if sha not in self.blobs:
+                path = self._shard_path(self.shard)
+                if os.path.exists(path) and os.path.getsize(path) >= SHARD_BYTES:
+                    self.shard += 1
+                    path = self._shard_path(self.shard)
+
+                blob = gzip.compress(body, compresslevel=6, mtime=0)
+                with open(path, "ab") as f:
+                    offset = f.tell()
+                    f.write(blob)
+                self.blobs[sha] = (self.shard, offset, len(blob))
+
+            shard, offset, size = self.blobs[sha]
+            entry = {
+                "key": key,
+                "sha256": sha,
+                "shard": shard,
+                "offset": offset,
+                "size": size,
+                "fetched_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+                **meta,
+            }
+            # The blob is written before its index line, so a crash never
+            # leaves an index entry pointing at missing data
+            with open(os.path.join(self.folder, INDEX_FILE), "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self.entries[key] = entry
+        return entry
+
+    def read(self, entry):
+        """Raw body bytes of an index entry."""
+        with open(self._shard_path(entry["shard"]), "rb") as f:
+            f.seek(entry["offset"])
+            return gzip.decompress(f.read(entry["size"]))
+
+    def get(self, key):
+        """Latest body stored for `key`, or None."""
+        entry = self.entries.get(key)
+        return self.read(entry) if entry else None
+
+    def get_text(self, key):
+        body = self.get(key)
+        return body.decode("utf-8") if body is not None else None
+
+    def find(self, prefix):
+        """Latest entries whose key starts with `prefix`, in key order."""
+        return [self.entries[k] for k in sorted(self.entries) if k.startswith(prefix)]
+
+
+def main():
+    if len(sys.argv) != 3 or sys.argv[1] != "stats":
+        print("usage: python archive.py stats <folder>")
+        sys.exit(1)
+
+    archive = ResponseArchive(sys.argv[2], readonly=True)
+    raw = sum(len(archive.read(e)) for e in archive.entries.values())
+    stored = sum(size for _, _, size in archive.blobs.values())
+    print(f"{len(archive)} requests, {len(archive.blobs)} distinct bodies")
+    print(f"raw {raw / 1e6:.1f} MB -> stored {stored / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
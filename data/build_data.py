@@ -1,37 +1,71 @@
+import argparse
 import json
 
+from jsonl import JsonlWriter, compact_jsonl, read_jsonl, truncate_jsonl
+
 input_file = "nitm_plants_all.jsonl"
 output_file = "plant_disease_support.json"
+# Streaming output; each record carries its source line in "_line"
+stream_file = "plant_disease_support.jsonl"
 
-records = []
 toxic_keywords = ["toxic", "poison", "fatal"]
 
-with open(input_file, "r", encoding="utf-8") as f:
-    for line in f:
-        plant = json.loads(line)
 
-        plant_name = plant.get("plant_name")
-        family = plant.get("family", "")
-        pharmacology = plant.get("pharmacology", "").lower()
+def support_records(plant):
+    plant_name = plant.get("plant_name")
+    family = plant.get("family", "")
+    pharmacology = plant.get("pharmacology", "").lower()
+
+    # crude toxicity detection
+    toxicity = any(word in pharmacology for word in toxic_keywords)
+
+    records = []
+    uses = plant.get("uses", [])
+    for u in uses:
+        disease = u.get("disease")
+        part_used = u.get("part_used", "Unknown")
+
+        if disease:
+            records.append({
+                "disease": disease.strip().title(),
+                "plant_name": plant_name,
+                "plant_part": part_used,
+                "family": family,
+                "toxicity": toxicity
+            })
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build plant_disease_support.json from the NITM scrape")
+    parser.add_argument("--input", default=input_file)
+    parser.add_argument("--output", default=output_file)
+    parser.add_argument("--jsonl", default=stream_file)
+    parser.add_argument("--no-compact", action="store_true", help="leave the JSONL, skip writing the JSON array")
+    args = parser.parse_args()
 
-        # crude toxicity detection
-        toxicity = any(word in pharmacology for word in toxic_keywords)
+    # Resume: the last source line seen may have been cut short, so its
+    # records are dropped and it is processed again
+    last_line, last_offset = -1, None
+    for offset, record in read_jsonl(args.jsonl):
+        if record.get("_line", -1) > last_line:
+            last_line, last_offset = record["_line"], offset
+    if last_offset is not None:
+        truncate_jsonl(args.jsonl, last_offset)
+        print(f"Resuming from line {last_line} of {args.input}")
+    resume_from = max(last_line, 0)
 
-        uses = plant.get("uses", [])
-        for u in uses:
-            disease = u.get("disease")
-            part_used = u.get("part_used", "Unknown")
+    with open(args.input, "r", encoding="utf-8") as f, JsonlWriter(args.jsonl) as out:
+        for n, line in enumerate(f):
+            if n < resume_from:
+                continue
+            plant = json.loads(line)
+            out.write_many([{**r, "_line": n} for r in support_records(plant)])
 
-            if disease:
-                records.append({
-                    "disease": disease.strip().title(),
-                    "plant_name": plant_name,
-                    "plant_part": part_used,
-                    "family": family,
-                    "toxicity": toxicity
-                })
+    if not args.no_compact:
+        count = compact_jsonl(args.jsonl, args.output, drop=["_line"], ensure_ascii=True)
+        print(f"✅ Created {args.output} with {count} entries")
 
-with open(output_file, "w", encoding="utf-8") as f:
-    json.dump(records, f, indent=2)
 
-print(f"✅ Created {output_file} with {len(records)} entries")
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,34 @@
-import json
-import itertools
-import random
+"""
+Build the instruction-tuning dataset from the three plant sources.
+
+Samples are produced by generators and written straight to sharded
+JSONL files; plants are split into contiguous partitions, one shard
+each, built in parallel. Pairwise comparisons are drawn with a fixed
+seed by sampling pair *ranks* and unranking them, instead of listing
+every combination. The same seed and shard count always give the same
+files. With the default single shard the output is
+plant_instruction_dataset_v2.jsonl; --shards N writes
+plant_instruction_dataset_v2-0000k-of-0000N.jsonl instead.
 
-instructions = []
+    python build_instruction_dataset.py [--seed 42] [--shards 1] [--workers 4] [--dedup]
 
-# Load datasets
-with open("plant_ai_dataset_v2_native_state.json") as f:
-    native_data = json.load(f)
+--dedup runs the MinHash/LSH near-duplicate stage (dedup.py) over the
+finished shards.
+"""
+import argparse
+import json
+import math
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
 
-with open("bsi_medicinal_plants_with_wikipedia.json") as f:
-    wiki_data = {p["plant_name"]: p for p in json.load(f)}
+from dedup import THRESHOLD, dedup_files
 
-nitm = []
-with open("nitm_plants_all.jsonl") as f:
-    for line in f:
-        nitm.append(json.loads(line))
-nitm_map = {p["plant_name"]: p for p in nitm}
+SEED = 42
+SHARDS = 1           # 1 keeps the single plant_instruction_dataset_v2.jsonl file
+PAIR_POOL = 200      # comparisons are drawn among the first PAIR_POOL plants
+PAIR_SAMPLES = 2000
+OUTPUT_PREFIX = "plant_instruction_dataset_v2"
 
 # Templates
 ecology_templates = [
@@ -52,36 +65,66 @@ chat_templates = [
     "Beginner question: What is {name} used for?"
 ]
 
-for plant in native_data:
+
+# ----------------------------------------------------------
+# Sources (only the fields the templates need are kept)
+# ----------------------------------------------------------
+def load_summaries(path="bsi_medicinal_plants_with_wikipedia"):
+    """plant_name -> Wikipedia summary, from the JSONL stream if present."""
+    summaries = {}
+    if os.path.exists(path + ".jsonl"):
+        with open(path + ".jsonl", encoding="utf-8") as f:
+            records = (json.loads(line) for line in f if line.endswith("\n"))
+            for p in records:
+                summaries[p["plant_name"]] = p.get("wikipedia_data", {}).get("summary")
+    else:
+        with open(path + ".json", encoding="utf-8") as f:
+            for p in json.load(f):
+                summaries[p["plant_name"]] = p.get("wikipedia_data", {}).get("summary")
+    return summaries
+
+
+def load_uses(path="nitm_plants_all.jsonl"):
+    """plant_name -> NITM uses list."""
+    uses = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            p = json.loads(line)
+            uses[p["plant_name"]] = p.get("uses", [])
+    return uses
+
+
+# ----------------------------------------------------------
+# Sample generators
+# ----------------------------------------------------------
+def plant_samples(plant, summary, uses):
     name = plant["plant_name"]
     origin = plant["origin_type"]
     carbon = plant.get("carbon_score", 0)
     risk = plant.get("risk_notes", "")
-    states = ", ".join(plant.get("suitable_states", []))
 
     # Base description
-    summary = wiki_data.get(name, {}).get(
-        "wikipedia_data", {}
-    ).get("summary", f"{name} is a plant species.")
+    if summary is None:
+        summary = f"{name} is a plant species."
 
     # --- Identity & ecology ---
     for t in ecology_templates:
-        instructions.append({
+        yield {
             "instruction": t.format(name=name),
             "input": "",
             "output": f"{name} is a {origin} plant that contributes to biodiversity. Carbon score: {carbon}."
-        })
+        }
 
     for t in native_templates:
-        instructions.append({
+        yield {
             "instruction": t.format(name=name),
             "input": "",
             "output": f"{name} is classified as {origin}. Native plants support ecosystems more effectively."
-        })
+        }
 
     # --- Safety ---
     for t in safety_templates:
-        instructions.append({
+        yield {
             "instruction": t.format(name=name),
             "input": "",
             "output": (
@@ -89,57 +132,151 @@ for plant in native_data:
                 if risk else
                 f"{name} has no major recorded toxicity but should be used responsibly."
             )
-        })
+        }
 
     # --- Medicinal ---
-    if name in nitm_map:
-        for use in nitm_map[name].get("uses", []):
-            disease = use["disease"]
-            part = use["part_used"]
-
-            for t in med_templates:
-                instructions.append({
-                    "instruction": t.format(name=name, disease=disease),
-                    "input": "",
-                    "output": (
-                        f"{name} is traditionally used for {disease} using the {part}. "
-                        "This is traditional knowledge, not a medical prescription."
-                    )
-                })
-
-            for t in prep_templates:
-                instructions.append({
-                    "instruction": t.format(name=name),
-                    "input": "",
-                    "output": (
-                        f"Traditionally, the {part} of {name} is prepared carefully. "
-                        "Expert guidance is recommended."
-                    )
-                })
+    for use in uses or []:
+        disease = use["disease"]
+        part = use["part_used"]
+
+        for t in med_templates:
+            yield {
+                "instruction": t.format(name=name, disease=disease),
+                "input": "",
+                "output": (
+                    f"{name} is traditionally used for {disease} using the {part}. "
+                    "This is traditional knowledge, not a medical prescription."
+                )
+            }
+
+        for t in prep_templates:
+            yield {
+                "instruction": t.format(name=name),
+                "input": "",
+                "output": (
+                    f"Traditionally, the {part} of {name} is prepared carefully. "
+                    "Expert guidance is recommended."
+                )
+            }
 
     # --- Conversational ---
     for t in chat_templates:
-        instructions.append({
+        yield {
             "instruction": t.format(name=name),
             "input": "",
             "output": summary
-        })
-
-# --- Pairwise comparisons (BIG MULTIPLIER) ---
-pairs = list(itertools.combinations(
-    [p["plant_name"] for p in native_data[:200]], 2
-))
-
-for a, b in random.sample(pairs, 2000):
-    instructions.append({
-        "instruction": f"Compare {a} and {b} in terms of ecological value.",
-        "input": "",
-        "output": "Native plants generally support biodiversity better than exotic plants."
-    })
-
-# Save
-with open("plant_instruction_dataset_v2.jsonl", "w") as f:
-    for item in instructions:
-        f.write(json.dumps(item) + "\n")
-
-print(f"✅ Generated {len(instructions)} instruction samples")
+        }
+
+
+def unrank_pair(r, n):
+    """The r-th pair (i, j), i < j, in itertools.combinations(range(n), 2) order."""
+    total = n * (n - 1) // 2
+    # Count back from the end: pairs with first index >= i number k(k+1)/2, k = n - 1 - i
+    k = (math.isqrt(8 * (total - 1 - r) + 1) - 1) // 2
+    i = n - 2 - k
+    before = total - (k + 1) * (k + 2) // 2    # pairs whose first index is < i
+    return i, i + 1 + (r - before)
+
+
+def sample_pair_ranks(n, k, seed):
+    """
+    k distinct pair ranks out of C(n, 2), drawn from a range so nothing is
+    materialised. Picks the same pairs as random.Random(seed).sample() over
+    the full combinations list would.
+    """
+    total = n * (n - 1) // 2
+    return random.Random(seed).sample(range(total), min(k, total))
+
+
+def pair_samples(names, ranks):
+    # --- Pairwise comparisons (BIG MULTIPLIER) ---
+    for r in ranks:
+        i, j = unrank_pair(r, len(names))
+        yield {
+            "instruction": f"Compare {names[i]} and {names[j]} in terms of ecological value.",
+            "input": "",
+            "output": "Native plants generally support biodiversity better than exotic plants."
+        }
+
+
+# ----------------------------------------------------------
+# Sharded output
+# ----------------------------------------------------------
+_sources = {}
+
+
+def _init_worker(plants, summaries, uses, pair_names):
+    _sources.update(plants=plants, summaries=summaries, uses=uses, pair_names=pair_names)
+
+
+def shard_path(prefix, shard, shards):
+    if shards == 1:
+        return f"{prefix}.jsonl"
+    return f"{prefix}-{shard:05d}-of-{shards:05d}.jsonl"
+
+
+def build_shard(job):
+    """Write one shard: its partition of plants, then its share of the pairs."""
+    shard, shards, start, stop, ranks, prefix = job
+    plants = _sources["plants"]
+
+    path = shard_path(prefix, shard, shards)
+    tmp = f"{path}.tmp"
+    count = 0
+    with open(tmp, "w") as f:
+        for plant in plants[start:stop]:
+            name = plant["plant_name"]
+            samples = plant_samples(plant, _sources["summaries"].get(name), _sources["uses"].get(name))
+            for item in samples:
+                f.write(json.dumps(item) + "\n")
+                count += 1
+        for item in pair_samples(_sources["pair_names"], ranks):
+            f.write(json.dumps(item) + "\n")
+            count += 1
+    os.replace(tmp, path)
+    return path, count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the instruction-tuning dataset")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--shards", type=int, default=SHARDS)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--output-prefix", default=OUTPUT_PREFIX)
+    parser.add_argument("--dedup", action="store_true", help="drop near-duplicate samples across shards")
+    parser.add_argument("--dedup-threshold", type=float, default=THRESHOLD)
+    args = parser.parse_args()
+
+    # Load datasets
+    with open("plant_ai_dataset_v2_native_state.json") as f:
+        native_data = json.load(f)
+    summaries = load_summaries()
+    uses = load_uses()
+
+    pair_names = [p["plant_name"] for p in native_data[:PAIR_POOL]]
+    ranks = sample_pair_ranks(len(pair_names), PAIR_SAMPLES, args.seed)
+
+    # Contiguous plant partitions; pair ranks are dealt round-robin
+    n = len(native_data)
+    bounds = [n * s // args.shards for s in range(args.shards + 1)]
+    jobs = [
+        (s, args.shards, bounds[s], bounds[s + 1], ranks[s::args.shards], args.output_prefix)
+        for s in range(args.shards)
+    ]
+
+    with ProcessPoolExecutor(max_workers=min(args.workers, args.shards), initializer=_init_worker,
+                             initargs=(native_data, summaries, uses, pair_names)) as pool:
+        results = list(pool.map(build_shard, jobs))
+
+    total = sum(count for _, count in results)
+    for path, count in results:
+        print(f"  {path}: {count} samples")
+    print(f"✅ Generated {total} instruction samples")
+
+    if args.dedup:
+        deduper = dedup_files([path for path, _ in results], args.dedup_threshold)
+        print(f"✅ Kept {len(deduper.kept)} samples after dedup")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Near-duplicate removal for instruction datasets (MinHash + LSH).
+
+Each sample's instruction + output is lower-cased and cut into word
+3-gram shingles. Shingles are hashed with crc32 and the sample gets a
+NUM_PERM-value MinHash signature. Signatures are split into BANDS bands
+of ROWS values, and samples sharing any band become candidates. A
+candidate counts as a duplicate only when the estimated Jaccard
+similarity (the share of equal signature values) reaches the threshold.
+Exact duplicates are caught first by a text digest.
+
+Files are streamed one line at a time and the first sample of each
+cluster is kept. Memory grows with the number of kept samples only, at
+a fixed cost per sample: a signature of NUM_PERM uint32 values plus
+BANDS bucket keys. It does not grow with line length or file count.
+
+    python dedup.py plant_instruction_dataset_v2-*.jsonl [--threshold 0.8]
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import time
+import zlib
+
+import numpy as np
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE = 3
+THRESHOLD = 0.8
+SEED = 1
+
+_WORD_RE = re.compile(r"\w+")
+_MASK32 = np.uint64(0xFFFFFFFF)
+
+
+def _permutations(seed=SEED):
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 2 ** 63, NUM_PERM, dtype=np.uint64) | np.uint64(1)   # odd multipliers
+    b = rng.integers(0, 2 ** 63, NUM_PERM, dtype=np.uint64)
+    return a, b
+
+
+_A, _B = _permutations()
+
+
+def shingles(text):
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < SHINGLE:
+        grams = [" ".join(words)]
+    else:
+        grams = [" ".join(words[i:i + SHINGLE]) for i in range(len(words) - SHINGLE + 1)]
+    return np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64, count=len(grams))
+
+
+def minhash(hashes):
+    """NUM_PERM-value signature: min over shingles of (a*x + b) >> 32 per permutation."""
+    with np.errstate(over="ignore"):
+        h = (hashes[:, None] * _A[None, :] + _B[None, :]) >> np.uint64(32)
+    return (h & _MASK32).min(axis=0).astype(np.uint32)
+
+
+def sample_text(sample):
+    return f"{sample.get('instruction', '')} {sample.get('input', '')} {sample.get('output', '')}"
+
+
+class Deduper:
+    def __init__(self, threshold=THRESHOLD):
+        self.threshold = threshold
+        self.exact = {}                      # text digest -> kept id
+        self.buckets = [{} for _ in range(BANDS)]
+        self.sigs = np.zeros((1024, NUM_PERM), dtype=np.uint32)
+        self.kept = []                       # kept id -> short label
+        self.cluster_size = []               # kept id -> samples in its cluster
+        self.seen = 0
+
+    def add(self, sample):
+        """Id of the kept sample this one duplicates, or None if it is kept itself."""
+        self.seen += 1
+        text = sample_text(sample)
+        digest = hashlib.blake2b(" ".join(text.lower().split()).encode("utf-8"), digest_size=8).digest()
+
+        dup = self.exact.get(digest)
+        if dup is None:
+            sig = minhash(shingles(text))
+            bands = [sig[i * ROWS:(i + 1) * ROWS].tobytes() for i in range(BANDS)]
+
+            candidates = {self.buckets[i][key] for i, key in enumerate(bands) if key in self.buckets[i]}
+            best = 0.0
+            for c in sorted(candidates):
+                similarity = float(np.mean(self.sigs[c] == sig))
+                if similarity >= self.threshold and similarity > best:
+                    dup, best = c, similarity
+
+            if dup is None:
+                self.exact[digest] = self._keep(sample, sig, bands)
+                return None
+
+        self.cluster_size[dup] += 1
+        return dup
+
+    def _keep(self, sample, sig, bands):
+        i = len(self.kept)
+        if i == len(self.sigs):
+            self.sigs = np.concatenate([self.sigs, np.zeros_like(self.sigs)])
+        self.sigs[i] = sig
+        for b, key in enumerate(bands):
+            self.buckets[b].setdefault(key, i)
+        self.kept.append(sample.get("instruction", "")[:80])
+        self.cluster_size.append(1)
+        return i
+
+    def report(self, top=10):
+        clusters = sorted(
+            ((n, i) for i, n in enumerate(self.cluster_size) if n > 1), reverse=True
+        )
+        dups = self.seen - len(self.kept)
+        print(f"{self.seen} samples, {len(self.kept)} kept, {dups} duplicates "
+              f"in {len(clusters)} clusters")
+        for n, i in clusters[:top]:
+            print(f"  {n:6d} x  {self.kept[i]!r}")
+
+
+def dedup_files(paths, threshold=THRESHOLD, in_place=True, suffix=".dedup"):
+    """
+    Stream `paths` in order, dropping near-duplicates across all of them.
+    Each file is rewritten (or written next to it with `suffix`).
+    """
+    deduper = Deduper(threshold)
+    start = time.perf_counter()
+
+    for path in paths:
+        out_path = path if in_place else path.replace(".jsonl", "") + suffix + ".jsonl"
+        tmp = f"{out_path}.tmp"
+        with open(path, "r", encoding="utf-8") as src, open(tmp, "w", encoding="utf-8") as out:
+            for line in src:
+                if deduper.add(json.loads(line)) is None:
+                    out.write(line)
+        os.replace(tmp, out_path)
+
+    elapsed = time.perf_counter() - start
+    deduper.report()
+    print(f"  {deduper.seen / max(elapsed, 1e-9):,.0f} samples/s")
+    return deduper
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drop near-duplicate samples from JSONL files")
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="estimated Jaccard for a duplicate")
+    parser.add_argument("--keep-input", action="store_true", help="write <name>.dedup.jsonl instead of rewriting")
+    args = parser.parse_args()
+
+    dedup_files(args.paths, args.threshold, in_place=not args.keep_input)
+
+
+if __name__ == "__main__":
+    main()
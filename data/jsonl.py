@@ -0,0 +1,108 @@
+"""
+Crash-safe JSONL output for the data scripts.
+
+Records are appended one line each and fsync'ed every `fsync_every`
+records or `fsync_seconds`, so a crash loses at most the last few. On
+restart, read_jsonl() drops a partial last line and the script skips the
+records it already has. compact_jsonl() turns the JSONL into the
+indented JSON array downstream code reads, one record at a time.
+"""
+import json
+import os
+import time
+
+
+class JsonlWriter:
+    def __init__(self, path, fsync_every=100, fsync_seconds=5.0):
+        self.f = open(path, "a", encoding="utf-8")
+        self.fsync_every = fsync_every
+        self.fsync_seconds = fsync_seconds
+        self.pending = 0
+        self.synced = time.monotonic()
+
+    def write(self, record):
+        self.write_many([record])
+
+    def write_many(self, records):
+        """Append records in a single write (e.g. all rows from one source item)."""
+        self.f.write("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records))
+        self.pending += len(records)
+        if self.pending >= self.fsync_every or time.monotonic() - self.synced >= self.fsync_seconds:
+            self.sync()
+
+    def sync(self):
+        self.f.flush()
+        os.fsync(self.f.fileno())
+        self.pending = 0
+        self.synced = time.monotonic()
+
+    def close(self):
+        self.sync()
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_jsonl(path, repair=True):
+    """
+    Yield (byte offset, record) for every complete line. A partial last
+    line (interrupted write) is cut off once the file has been read when
+    `repair` is set, so appending can continue cleanly.
+    """
+    if not os.path.exists(path):
+        return
+
+    partial = None
+    offset = 0
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                partial = offset
+                break
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            if record is not None:
+                yield offset, record
+            offset += len(line)
+
+    if repair and partial is not None:
+        with open(path, "r+b") as f:
+            f.truncate(partial)
+
+
+def truncate_jsonl(path, offset):
+    with open(path, "r+b") as f:
+        f.truncate(offset)
+
+
+def compact_jsonl(jsonl_path, json_path, sort_key=None, drop=(), ensure_ascii=False):
+    """
+    Write the records of `jsonl_path` as a JSON array, formatted like
+    json.dump(records, indent=2). With `sort_key`, records are ordered by
+    that field (the last record wins for repeated values). Fields in
+    `drop` are removed. Only offsets are kept in memory.
+    """
+    entries = {}
+    for n, (offset, record) in enumerate(read_jsonl(jsonl_path, repair=False)):
+        entries[record.get(sort_key) if sort_key else n] = offset
+
+    tmp = f"{json_path}.tmp"
+    with open(jsonl_path, "rb") as src, open(tmp, "w", encoding="utf-8") as out:
+        out.write("[")
+        for n, key in enumerate(sorted(entries)):
+            src.seek(entries[key])
+            record = json.loads(src.readline())
+            for field in drop:
+                record.pop(field, None)
+
+            text = json.dumps(record, indent=2, ensure_ascii=ensure_ascii)
+            out.write(("," if n else "") + "\n  " + text.replace("\n", "\n  "))
+        out.write("\n]" if entries else "]")
+    os.replace(tmp, json_path)
+    return len(entries)
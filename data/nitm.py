@@ -5,7 +5,8 @@ Full scraper for NITM Medicinal Plants DB
 
 What this script does:
 1. Checks robots.txt for permission to access /autocomplete.php and /search_results.php
-2. Harvests scientific names via autocomplete.php by iterating over prefixes (a..z, 0..9, common digrams)
+2. Harvests scientific names via autocomplete.php by expanding prefixes trie-style
+   (a..z, 0..9, then longer prefixes only where a response looks truncated)
 3. For each unique name, posts to search_results.php (keycat=1) to retrieve the detail page HTML
 4. Parses the detail HTML to extract:
    - plant_name, vernacular names, synonyms, author, family, description, phenology
@@ -17,8 +18,19 @@ What this script does:
 5. Saves each record as a JSONL line to output file
 6. Optional: download images to a folder (set DOWNLOAD_IMAGES=True)
 
+Every detail page is also kept in a compressed response archive
+(archive.py), so `--reparse` can rebuild the output file offline, in
+parallel across cores, after a parser change.
+
+Requests run on a small thread pool; a per-host token bucket keeps the
+overall rate at one request per RATE_LIMIT_SECONDS however many workers
+there are. Names already present in the output file are skipped, so an
+interrupted run resumes where it stopped.
+
 USAGE:
-    python3 nitmmedplants_full_scraper.py
+    python3 nitm.py [--workers 4] [--rate 1.0] [--base http://localhost:8000/]
+    python3 nitm.py --check-parser [saved_pages/] [--write-golden --parser html.parser]
+    python3 nitm.py --reparse [--archive raw_archive]
 
 Requirements:
     pip install requests beautifulsoup4 tqdm
@@ -29,29 +41,105 @@ CAUTION / ETHICS:
  - If you plan heavy use, contact the site admins first.
 """
 
-import requests, json, time, os, sys, re
+import argparse, requests, json, time, os, sys, re, threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+import lxml.etree, lxml.html
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin, urlparse
 from urllib.robotparser import RobotFileParser
 from tqdm import tqdm
 from requests.adapters import HTTPAdapter, Retry
 
+from archive import ARCHIVE_DIR, ResponseArchive, request_key
+from jsonl import read_jsonl
+
 # ---------- CONFIG ----------
 BASE = "https://nitmmedplantsdb.in/"
 AUTOCOMPLETE = urljoin(BASE, "autocomplete.php")
 SEARCH_RESULTS = urljoin(BASE, "search_results.php")
 USER_AGENT = "NITM-MedicinalPlantBot/1.0 (+mailto:your-email@example.com)"
 OUTPUT_FILE = "nitm_plants_all.jsonl"
+NAMES_FILE = "nitm_names.json"     # checkpoint of the autocomplete harvest
 IMAGES_DIR = "nitm_images"
-RATE_LIMIT_SECONDS = 1.0      # seconds between requests
+RATE_LIMIT_SECONDS = 1.0      # seconds between requests (per host)
+WORKERS = 4                   # concurrent requests in flight
 DOWNLOAD_IMAGES = False       # set True to download images
 MAX_RETRIES = 3
+PARSER_BACKEND = "lxml"       # or "html.parser" (BeautifulSoup, slower)
+AUTOCOMPLETE_LIMIT = None     # server-side result cap; None = infer it
+MAX_PREFIX_LEN = 12           # stop expanding prefixes past this length
+FIXTURES_DIR = "fixtures/nitm"  # saved detail pages + expected JSON for --check-parser
+GOLDEN_BACKEND_FILE = "golden_backend.txt"  # in FIXTURES_DIR: backend that wrote the JSON
+ROOT_ALPHABET = "abcdefghijklmnopqrstuvwxyz0123456789"
+# prefixes used before trie expansion: single letters and digits and some common bigrams
+FIXED_PREFIXES = list(ROOT_ALPHABET) + ["aa","ab","ac","ad","al","an","ar","ba","be","bi","ca","ch","co","de","di","dr","ga","ha","ka","kh","ma","mu","na","ni","pa","ph","ra","re","sa","sh","ta","th","va"]
 # ----------------------------
 
 session = requests.Session()
 session.headers.update({"User-Agent": USER_AGENT})
 retries = Retry(total=5, backoff_factor=0.5, status_forcelist=[429,500,502,503,504])
-session.mount("https://", HTTPAdapter(max_retries=retries))
+session.mount("https://", HTTPAdapter(max_retries=retries, pool_maxsize=WORKERS))
+session.mount("http://", HTTPAdapter(max_retries=retries, pool_maxsize=WORKERS))
+
+archive = None   # ResponseArchive for fetched detail pages, see configure()
+
+def configure(base=None, rate=None, workers=None, parser=None, archive_dir=None):
+    """Point the scraper at another host (e.g. a local stub), change pacing, parser or archive."""
+    global BASE, AUTOCOMPLETE, SEARCH_RESULTS, RATE_LIMIT_SECONDS, WORKERS, PARSER_BACKEND, archive
+    if base:
+        BASE = base if base.endswith("/") else base + "/"
+        AUTOCOMPLETE = urljoin(BASE, "autocomplete.php")
+        SEARCH_RESULTS = urljoin(BASE, "search_results.php")
+    if rate is not None:
+        RATE_LIMIT_SECONDS = rate
+        _buckets.clear()
+    if workers:
+        WORKERS = workers
+        for prefix in ("https://", "http://"):
+            session.mount(prefix, HTTPAdapter(max_retries=retries, pool_maxsize=workers))
+    if parser:
+        PARSER_BACKEND = parser
+    if archive_dir:
+        archive = ResponseArchive(archive_dir)
+
+# ---------- rate limiting ----------
+class TokenBucket:
+    """Allows `rate` acquisitions per second on average, bursts up to `burst`."""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+_request_count = {"autocomplete": 0, "search": 0}
+_count_lock = threading.Lock()
+
+def wait_turn(url):
+    """Block until the host of `url` may be hit again."""
+    if RATE_LIMIT_SECONDS <= 0:
+        return
+    host = urlparse(url).netloc
+    with _buckets_lock:
+        bucket = _buckets.get(host)
+        if bucket is None:
+            bucket = _buckets[host] = TokenBucket(1.0 / RATE_LIMIT_SECONDS)
+    bucket.acquire()
 
 def check_robots_ok(urls):
     """Check robots.txt using urllib.robotparser"""
@@ -74,9 +162,14 @@ def check_robots_ok(urls):
             return False
     return True
 
+_QUOTED_RE = re.compile(r'\"([^\"]+)\"')
+
 def fetch_autocomplete(prefix):
     """Call autocomplete.php with given prefix; expect JSON (array)"""
     try:
+        wait_turn(AUTOCOMPLETE)
+        with _count_lock:
+            _request_count["autocomplete"] += 1
         r = session.get(AUTOCOMPLETE, params={"term": prefix, "extraParams": 1}, timeout=20)
         r.raise_for_status()
         # Some sites return JSON array or array of objects. Try to parse robustly.
@@ -86,7 +179,7 @@ def fetch_autocomplete(prefix):
             # if not JSON, try to extract quoted items
             txt = r.text
             # attempt to find quoted suggestions
-            items = re.findall(r'\"([^\"]+)\"', txt)
+            items = _QUOTED_RE.findall(txt)
             return items
     except Exception as e:
         print(f"[WARN] autocomplete failed for prefix='{prefix}': {e}")
@@ -96,52 +189,197 @@ def normalize_name(s):
     if not s: return s
     return ' '.join(s.strip().split())
 
-def get_all_scientific_names():
-    """Build full set of names by probing autocomplete with many prefixes."""
-    print("[*] Collecting plant names via autocomplete...")
+def autocomplete_labels(items):
+    """Normalised labels from an autocomplete response."""
+    labels = []
+    # autocomplete may return list of strings or list of {label:...,value:...} dicts
+    for it in items:
+        if isinstance(it, dict):
+            label = it.get("label") or it.get("value") or it.get("name") or str(it)
+        else:
+            label = it
+        if not label:
+            continue
+        label = normalize_name(label)
+        # small filter: ensure it looks like a binomial (two words) OR contains known characters
+        if len(label) > 1:
+            labels.append(label)
+    return labels
+
+def fixed_prefix_names():
+    """Old strategy: single letters / digits plus a hand-picked list of bigrams."""
     names = set()
+    with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+        for items in pool.map(fetch_autocomplete, FIXED_PREFIXES):
+            names.update(autocomplete_labels(items))
+    return names
 
-    # prefixes: single letters and digits and some common bigrams to try to discover all entries
-    prefixes = list("abcdefghijklmnopqrstuvwxyz0123456789")
-    prefixes += ["aa","ab","ac","ad","al","an","ar","ba","be","bi","ca","ch","co","de","di","dr","ga","ha","ka","kh","ma","mu","na","ni","pa","ph","ra","re","sa","sh","ta","th","va"]
+def trie_prefix_names(limit=AUTOCOMPLETE_LIMIT):
+    """
+    Expand prefixes like a trie: a prefix is only extended by one more
+    character when its response came back full (i.e. probably cut off at
+    the server's result cap). Each level is fetched concurrently.
 
-    for p in prefixes:
-        items = fetch_autocomplete(p)
-        # autocomplete may return list of strings or list of {label:...,value:...} dicts
-        for it in items:
-            if isinstance(it, dict):
-                label = it.get("label") or it.get("value") or it.get("name") or str(it)
-            else:
-                label = it
-            if not label:
-                continue
-            label = normalize_name(label)
-            # small filter: ensure it looks like a binomial (two words) OR contains known characters
-            if len(label) > 1:
-                names.add(label)
-        time.sleep(RATE_LIMIT_SECONDS)  # polite pacing
+    When `limit` is None the cap is taken as the largest response size
+    seen on the first level, provided at least two prefixes hit it.
+    """
+    names = set()
+    alphabet = set(ROOT_ALPHABET) - set("0123456789")
+    level = list(ROOT_ALPHABET)
+
+    with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+        while level:
+            responses = list(pool.map(fetch_autocomplete, level))
+            labels = [autocomplete_labels(items) for items in responses]
+            for found in labels:
+                names.update(found)
+                alphabet.update(c for name in found for c in name.lower())
+
+            if limit is None:
+                sizes = [len(items) for items in responses]
+                cap = max(sizes, default=0)
+                limit = cap if cap and sizes.count(cap) > 1 else 0
+                if limit:
+                    print(f"[INFO] autocomplete appears capped at {limit} results")
+
+            nxt = []
+            for prefix, items in zip(level, responses):
+                if limit and len(items) >= limit and len(prefix) < MAX_PREFIX_LEN:
+                    # only characters names can actually continue with
+                    nxt += [prefix + c for c in sorted(alphabet) if c.isalnum() or c in " .-'"]
+            level = nxt
+
+    return names
+
+def get_all_scientific_names(strategy="trie"):
+    """Build full set of names by probing autocomplete with prefixes."""
+    print(f"[*] Collecting plant names via autocomplete ({strategy} prefixes)...")
+    if strategy == "fixed":
+        names = fixed_prefix_names()
+    else:
+        names = trie_prefix_names()
 
     print(f"[+] Found {len(names)} candidate names from autocomplete.")
     # Optionally return sorted list
     return sorted(names)
 
+def compare_prefix_strategies():
+    """Requests issued and names found by the fixed list vs trie expansion."""
+    results = {}
+    for strategy in ("fixed", "trie"):
+        before = _request_count["autocomplete"]
+        names = get_all_scientific_names(strategy)
+        results[strategy] = (_request_count["autocomplete"] - before, set(names))
+
+    for strategy, (requests_issued, names) in results.items():
+        print(f"{strategy:6s} {requests_issued:6d} requests  {len(names):6d} names")
+    missed = results["trie"][1] - results["fixed"][1]
+    print(f"names only found by trie expansion: {len(missed)}")
+    return results
+
 def post_search_for_name(name):
     """
     POST to search_results.php with keycat=1 (Plant Scientific Name).
     Response is the detail page HTML (per provided sample).
     """
     try:
-        r = session.post(SEARCH_RESULTS, data={"keycat": 1, "keyword": name}, timeout=30)
+        wait_turn(SEARCH_RESULTS)
+        with _count_lock:
+            _request_count["search"] += 1
+        params = {"keycat": 1, "keyword": name}
+        r = session.post(SEARCH_RESULTS, data=params, timeout=30)
         r.raise_for_status()
+        if archive is not None:
+            archive.put(
+                request_key("POST", SEARCH_RESULTS, params), r.content,
+                kind="nitm_detail", keyword=name, url=SEARCH_RESULTS,
+                encoding=r.encoding or r.apparent_encoding,
+            )
         return r.text
     except Exception as e:
         print(f"[ERROR] search POST failed for '{name}': {e}")
         return None
 
 # -- Parsers for the detail HTML (based on the Search Result.html you provided) --
-def parse_species_html(html, base=BASE):
+_AUTHOR_RE = re.compile(r'Author\s*:\s*(.+)')
+_FAMILY_RE = re.compile(r'Family\s*:\s*(.+)')
+LOCATION_FIELDS = ["place", "district", "state", "country", "soil", "vegetation", "source", "occurrence"]
+
+_lxml_parser = lxml.html.HTMLParser(encoding="utf-8")
+
+def _lxml_text(el, sep=" "):
+    return sep.join(s.strip() for s in el.itertext() if s.strip()) if sep else "".join(el.itertext())
+
+def _scan_lxml(html):
+    """
+    One walk over an lxml tree: (h2 text, container snippet, rows, image
+    srcs). Each row is (row text, td texts, href finder).
+    """
+    if isinstance(html, str):
+        html = html.encode("utf-8")
+    try:
+        doc = lxml.html.document_fromstring(html, parser=_lxml_parser)
+    except lxml.etree.ParserError:
+        # Whitespace- or comment-only page: an empty record, like html.parser
+        return None, None, [], []
+
+    snippet = None
+    for div in doc.iter("div"):
+        if "container" in (div.get("class") or "").split():
+            snippet = lxml.html.tostring(div, encoding="unicode", with_tail=False)[:2000]
+            break
+
+    # get_text() in BeautifulSoup skips script / style contents
+    lxml.etree.strip_elements(doc, "script", "style", with_tail=False)
+
+    h2_text, rows, images = None, [], []
+    for el in doc.iter("tr", "img", "h2"):
+        if el.tag == "tr":
+            cells = [_lxml_text(td) for td in el.iter("td")]
+
+            def href(tr=el):
+                for a in tr.iter("a"):
+                    if a.get("href") is not None:
+                        return a.get("href")
+                return None
+
+            rows.append((_lxml_text(el), cells, href))
+        elif el.tag == "img":
+            images.append(el.get("src") or el.get("data-src"))
+        elif h2_text is None:
+            h2_text = _lxml_text(el, sep="")
+
+    return h2_text, snippet, rows, images
+
+def _scan_soup(html):
+    """Same as _scan_lxml, over a BeautifulSoup html.parser tree."""
     soup = BeautifulSoup(html, "html.parser")
 
+    body_div = soup.find("div", {"class": "container"})
+    snippet = str(body_div)[:2000] if body_div else None
+
+    h2_text, rows, images = None, [], []
+    for el in soup.find_all(["tr", "img", "h2"]):
+        if el.name == "tr":
+            cells = [td.get_text(" ", strip=True) for td in el.find_all("td")]
+
+            def href(tr=el):
+                a = tr.find("a", href=True)
+                return a["href"] if a else None
+
+            rows.append((el.get_text(" ", strip=True), cells, href))
+        elif el.name == "img":
+            images.append(el.get("src") or el.get("data-src"))
+        elif h2_text is None:
+            h2_text = el.get_text()
+
+    return h2_text, snippet, rows, images
+
+PARSER_BACKENDS = {"lxml": _scan_lxml, "html.parser": _scan_soup}
+
+def parse_species_html(html, base=BASE, backend=None):
+    h2_text, snippet, rows, images = PARSER_BACKENDS[backend or PARSER_BACKEND](html)
+
     data = {
         "plant_name": None,
         "vernacular_names": [],
@@ -156,141 +394,97 @@ def parse_species_html(html, base=BASE):
         "chemical_composition": None,
         "uses": [],
         "images": [],
-        "raw_html_snippet": None
+        # Save a raw snippet for provenance (limited length)
+        "raw_html_snippet": snippet,
     }
 
     # plant name (h2)
-    h2 = soup.find("h2")
-    if h2:
-        data["plant_name"] = normalize_name(h2.get_text())
-
-    # collect rows
-    rows = soup.find_all("tr")
-    # Save a raw snippet for provenance
-    body_div = soup.find("div", {"class": "container"})
-    if body_div:
-        data["raw_html_snippet"] = str(body_div)[:2000]  # limited length
+    if h2_text is not None:
+        data["plant_name"] = normalize_name(h2_text)
 
-    # The page used combined <td colspan=...> blocks for many fields.
-    for tr in rows:
-        t = tr.get_text(" ", strip=True)
-
-        # vernacular
+    # Single pass over the rows. Every row is checked for a labelled field;
+    # the uses section starts at the "Disease Name | Part Name" header, and
+    # rows with 8+ cells are kept aside for the location table.
+    wide_rows = []
+    use_section = False
+    for t, cells, href in rows:
+        # vernacular: "Vernacular Name - Language : Blackeyed Susan (English) ,Coral pea..."
         if "Vernacular Name" in t:
-            # the text looks like "Vernacular Name - Language : Blackeyed Susan (English) ,Coral pea..."
-            # find the colon and split
             if ":" in t:
-                after = t.split(":",1)[1]
-                # split by comma but keep phrases with parentheses
-                parts = [normalize_name(x) for x in after.split(",") if x.strip()]
-                data["vernacular_names"].extend(parts)
+                after = t.split(":", 1)[1]
+                data["vernacular_names"].extend(normalize_name(x) for x in after.split(",") if x.strip())
 
-        # synonym
+        # synonym: "Synonym(s) : Not Available"
         elif t.startswith("Synonym") or "Synonym(s)" in t:
-            # "Synonym(s) : Not Available"
             if ":" in t:
-                data["synonyms"] = normalize_name(t.split(":",1)[1])
+                data["synonyms"] = normalize_name(t.split(":", 1)[1])
 
-        # author
-        elif t.startswith("Author") or "Author" in t and len(t.split())<=4:
-            # fallback: look for "Author :" pattern
-            m = re.search(r'Author\s*:\s*(.+)', t)
+        elif t.startswith("Author") or "Author" in t and len(t.split()) <= 4:
+            m = _AUTHOR_RE.search(t)
             if m:
                 data["author"] = normalize_name(m.group(1))
 
-        # family
         elif "Family" in t:
-            m = re.search(r'Family\s*:\s*(.+)', t)
+            m = _FAMILY_RE.search(t)
             if m:
                 data["family"] = normalize_name(m.group(1))
 
-        # Basic description
+        # "Basic Description of Plant : A glabrous..."
         elif "Basic Description" in t or "Basic description" in t:
-            # "Basic Description of Plant : A glabrous..."
-            parts = t.split(":",1)
+            parts = t.split(":", 1)
             if len(parts) > 1:
                 data["description"] = normalize_name(parts[1])
 
-        # Phenology
         elif "Phenology" in t:
-            parts = t.split(":",1)
+            parts = t.split(":", 1)
             if len(parts) > 1:
                 data["phenology"] = normalize_name(parts[1])
 
-        # Pharmacology block: pages typically have a big "Pharmacology:" followed by large text
+        # Pharmacology block, with a "View Reference" link in the same row
         elif "Pharmacology" in t and ("Pharmacology:" in t or t.lower().startswith("pharmacology")):
-            # take after 'Pharmacology:' or after the heading
             if "Pharmacology:" in t:
-                data["pharmacology"] = normalize_name(t.split("Pharmacology:",1)[1])
+                data["pharmacology"] = normalize_name(t.split("Pharmacology:", 1)[1])
             else:
                 data["pharmacology"] = normalize_name(t)
+            link = href()
+            if link is not None:
+                data["pharmacology_reference"] = urljoin(base, link)
 
-            # link for View Reference present under same tr sometimes
-            a = tr.find("a", href=True)
-            if a:
-                data["pharmacology_reference"] = urljoin(base, a["href"])
-
-        # Chemical Composition section
         elif "Chemical Composition" in t or "Chemical composition" in t:
-            parts = t.split(":",1)
+            parts = t.split(":", 1)
             if len(parts) > 1:
                 data["chemical_composition"] = normalize_name(parts[1])
 
-    # Location table detection:
-    # The sample has header row with "Place | District | State | Country | Soil | Vegitation | Source | Occurrence"
-    # We attempt to find that row and then capture subsequent rows with 8 columns.
-    location_headers = None
-    for tr in rows:
-        t = [td.get_text(" ", strip=True) for td in tr.find_all("td")]
-        if len(t) >= 8 and "Place" in t[0] and "District" in t[1]:
-            location_headers = t[:8]
-            break
+        if len(cells) >= 8:
+            wide_rows.append(cells)
 
-    if location_headers:
-        found = False
-        for tr in rows:
-            cells = tr.find_all("td")
-            txts = [c.get_text(" ", strip=True) for c in cells]
-            if len(txts) >= 8 and txts[0] == location_headers[0]:
-                found = True
-                continue
-            if found and len(txts) >= 8:
-                # Append until next section header likely occurs
-                data["locations"].append({
-                    "place": txts[0],
-                    "district": txts[1],
-                    "state": txts[2],
-                    "country": txts[3],
-                    "soil": txts[4],
-                    "vegetation": txts[5],
-                    "source": txts[6],
-                    "occurrence": txts[7]
-                })
-
-    # Uses table: detect header row "Disease Name" and "Part Name"
-    use_section = False
-    for tr in rows:
-        t = [td.get_text(" ", strip=True) for td in tr.find_all("td")]
-        textjoined = " ".join(t)
-        if "Disease Name" in textjoined and "Part Name" in textjoined:
+        # Uses table: <td colspan=4> disease </td><td colspan=4> part </td>
+        joined = " ".join(cells)
+        if "Disease Name" in joined and "Part Name" in joined:
             use_section = True
             continue
         if use_section:
-            # many rows in the form <td colspan=4> disease </td><td colspan=4> part </td>
-            # get the non-empty cells
-            cells = [c.get_text(" ", strip=True) for c in tr.find_all("td") if c.get_text(" ", strip=True)]
-            if len(cells) >= 2:
-                disease = normalize_name(cells[0])
-                part = normalize_name(cells[-1])
+            filled = [c for c in cells if c]
+            if len(filled) >= 2:
+                disease = normalize_name(filled[0])
                 if disease:
-                    data["uses"].append({"disease": disease, "part_used": part})
+                    data["uses"].append({"disease": disease, "part_used": normalize_name(filled[-1])})
 
-    # Images: find image tags linking to PlantImage folder or assets/img/PlantImage
-    for img in soup.find_all("img"):
-        src = img.get("src") or img.get("data-src")
-        if not src:
-            continue
-        if "PlantImage" in src or "assets/img/PlantImage" in src:
+    # Location table: header row "Place | District | State | Country | Soil |
+    # Vegitation | Source | Occurrence", then every later row with 8 cells
+    header = next((c for c in wide_rows if "Place" in c[0] and "District" in c[1]), None)
+    if header:
+        found = False
+        for cells in wide_rows:
+            if cells[0] == header[0]:
+                found = True
+                continue
+            if found:
+                data["locations"].append(dict(zip(LOCATION_FIELDS, cells)))
+
+    # Images: only those from the PlantImage folder
+    for src in images:
+        if src and "PlantImage" in src:
             data["images"].append(urljoin(base, src))
 
     # Deduplicate lists
@@ -300,10 +494,102 @@ def parse_species_html(html, base=BASE):
 
     return data
 
+def _golden_text(record):
+    return json.dumps(record, ensure_ascii=False, indent=1) + "\n"
+
+def check_parser(folder=FIXTURES_DIR, write_golden=False):
+    """
+    Parse every saved page in `folder` with each backend and compare the
+    JSON byte for byte against the golden <page>.json next to it; report
+    pages/second. The backend that wrote the golden files is recorded in
+    GOLDEN_BACKEND_FILE, and raw_html_snippet is only compared for that
+    backend: each backend serialises it slightly differently (e.g. <br>
+    vs <br/>).
+    """
+    pages = sorted(f for f in os.listdir(folder) if f.endswith(".html"))
+    html = {}
+    for name in pages:
+        with open(os.path.join(folder, name), "r", encoding="utf-8") as f:
+            html[name] = f.read()
+
+    if write_golden:
+        for name in pages:
+            with open(os.path.join(folder, name[:-5] + ".json"), "w", encoding="utf-8") as f:
+                f.write(_golden_text(parse_species_html(html[name])))
+        with open(os.path.join(folder, GOLDEN_BACKEND_FILE), "w", encoding="utf-8") as f:
+            f.write(PARSER_BACKEND + "\n")
+        print(f"[INFO] wrote {len(pages)} golden files with the {PARSER_BACKEND} parser")
+        return True
+
+    with open(os.path.join(folder, GOLDEN_BACKEND_FILE), "r", encoding="utf-8") as f:
+        golden_backend = f.read().strip()
+
+    ok = True
+    for backend in PARSER_BACKENDS:
+        start = time.perf_counter()
+        parsed = {name: parse_species_html(html[name], backend=backend) for name in pages}
+        elapsed = time.perf_counter() - start
+
+        mismatched = 0
+        for name in pages:
+            with open(os.path.join(folder, name[:-5] + ".json"), "r", encoding="utf-8") as f:
+                expected = f.read()
+            record = parsed[name]
+            if backend != golden_backend:
+                record = {**record, "raw_html_snippet": json.loads(expected).get("raw_html_snippet")}
+            if _golden_text(record) != expected:
+                golden = json.loads(expected)
+                fields = [k for k in record if golden.get(k) != record[k]] or ["formatting"]
+                mismatched += 1
+                print(f"[DIFF] {backend} {name}: {', '.join(fields)}")
+
+        ok = ok and not mismatched
+        print(f"{backend:12s} {len(pages) / elapsed:8.1f} pages/s  {mismatched} of {len(pages)} pages differ")
+    return ok
+
 def save_jsonl(record, fpath=OUTPUT_FILE):
     with open(fpath, "a", encoding="utf-8") as f:
         f.write(json.dumps(record, ensure_ascii=False) + "\n")
 
+def load_checkpoint(fpath=OUTPUT_FILE):
+    """Harvested names already saved in the output file (a partial last line is dropped)."""
+    return {r["_harvested_name"] for _, r in read_jsonl(fpath) if r.get("_harvested_name")}
+
+def load_names(fpath=NAMES_FILE, refresh=False, strategy="trie"):
+    """Autocomplete harvest, reused from the checkpoint file when present."""
+    if not refresh and os.path.exists(fpath):
+        with open(fpath, "r", encoding="utf-8") as f:
+            names = json.load(f)
+        print(f"[INFO] reusing {len(names)} names from {fpath}")
+        return names
+
+    names = get_all_scientific_names(strategy)
+    if names:
+        tmp = f"{fpath}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(names, f, ensure_ascii=False)
+        os.replace(tmp, fpath)
+    return names
+
+def scrape_name(name):
+    """Fetch and parse one detail page; None when the request failed."""
+    html = post_search_for_name(name)
+    if not html:
+        return None
+
+    record = parse_species_html(html)
+    # add metadata
+    record["_harvested_name"] = name
+    record["_source_search_url"] = SEARCH_RESULTS
+    record["_retrieved_at"] = time.strftime("%Y-%m-%d %H:%M:%S")
+
+    # optionally download images
+    if DOWNLOAD_IMAGES and record.get("images"):
+        for url in record["images"]:
+            download_image(url)
+
+    return record
+
 def download_image(url, dest_folder=IMAGES_DIR):
     try:
         os.makedirs(dest_folder, exist_ok=True)
@@ -311,6 +597,7 @@ def download_image(url, dest_folder=IMAGES_DIR):
         dest_path = os.path.join(dest_folder, fname)
         if os.path.exists(dest_path):
             return dest_path
+        wait_turn(url)
         r = session.get(url, stream=True, timeout=30)
         r.raise_for_status()
         with open(dest_path, "wb") as fh:
@@ -321,57 +608,133 @@ def download_image(url, dest_folder=IMAGES_DIR):
         print(f"[WARN] failed to download image {url}: {e}")
         return None
 
+# -- Offline re-parse from the response archive --
+_reparse_archive = None
+
+def _init_reparse(folder, backend):
+    global _reparse_archive, PARSER_BACKEND
+    _reparse_archive = ResponseArchive(folder, readonly=True)
+    PARSER_BACKEND = backend
+
+def _reparse_entry(entry):
+    """Record for one archived page; None (with a warning) when it cannot be read or parsed."""
+    try:
+        body = _reparse_archive.read(entry)
+        # Decoded the way requests produced r.text when it was fetched
+        html = body.decode(entry.get("encoding") or "utf-8", errors="replace")
+        record = parse_species_html(html)
+    except Exception as e:
+        print(f"[WARN] could not re-parse {entry['keyword']!r}: {e}")
+        return None
+
+    record["_harvested_name"] = entry["keyword"]
+    record["_source_search_url"] = entry["url"]
+    record["_retrieved_at"] = entry["fetched_at"]
+    return record
+
+def reparse(folder, fpath=OUTPUT_FILE, workers=None):
+    """Rebuild the output file from archived detail pages, without network access."""
+    entries = [e for e in ResponseArchive(folder, readonly=True).entries.values()
+               if e.get("kind") == "nitm_detail"]
+    # One page per harvested name (latest fetch), in name order like a crawl
+    latest = {}
+    for e in entries:
+        latest[e["keyword"]] = e
+    entries = [latest[k] for k in sorted(latest)]
+
+    start = time.perf_counter()
+    tmp = f"{fpath}.tmp"
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count(),
+                             initializer=_init_reparse,
+                             initargs=(folder, PARSER_BACKEND)) as pool, \
+            open(tmp, "w", encoding="utf-8") as f:
+        failed = 0
+        for record in pool.map(_reparse_entry, entries, chunksize=16):
+            if record is None:
+                failed += 1
+                continue
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    os.replace(tmp, fpath)
+
+    elapsed = time.perf_counter() - start
+    print(f"[DONE] re-parsed {len(entries)} pages in {elapsed:.1f} s "
+          f"({len(entries) / max(elapsed, 1e-9):.0f} pages/s), {failed} failed. Output: {fpath}")
+
 def main():
+    parser = argparse.ArgumentParser(description="Scrape the NITM Medicinal Plants DB")
+    parser.add_argument("--base", default=BASE, help="site root (e.g. a local stub server)")
+    parser.add_argument("--output", default=OUTPUT_FILE)
+    parser.add_argument("--names-file", default=NAMES_FILE)
+    parser.add_argument("--refresh-names", action="store_true", help="re-run the autocomplete harvest")
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--rate", type=float, default=RATE_LIMIT_SECONDS, help="seconds between requests per host")
+    parser.add_argument("--prefixes", choices=["trie", "fixed"], default="trie", help="autocomplete prefix strategy")
+    parser.add_argument("--compare-prefixes", action="store_true", help="report requests / names per strategy and exit")
+    parser.add_argument("--parser", choices=sorted(PARSER_BACKENDS), default=PARSER_BACKEND, help="HTML parser backend")
+    parser.add_argument("--check-parser", metavar="DIR", nargs="?", const=FIXTURES_DIR,
+                        help=f"golden-check and benchmark the parser on saved pages (default {FIXTURES_DIR}), then exit")
+    parser.add_argument("--write-golden", action="store_true", help="with --check-parser: (re)write the golden JSON files")
+    parser.add_argument("--archive", default=ARCHIVE_DIR, help="raw response archive folder")
+    parser.add_argument("--no-archive", action="store_true", help="do not archive fetched pages")
+    parser.add_argument("--reparse", action="store_true", help="rebuild --output from the archive offline, then exit")
+    args = parser.parse_args()
+
+    if args.reparse:
+        configure(parser=args.parser)
+        reparse(args.archive, args.output)
+        return
+
+    configure(args.base, args.rate, args.workers, args.parser,
+              None if args.no_archive else args.archive)
+
+    if args.check_parser:
+        ok = check_parser(args.check_parser, args.write_golden)
+        sys.exit(0 if ok else 1)
+
     # 1. robots check
     allowed = check_robots_ok([AUTOCOMPLETE, SEARCH_RESULTS])
     if not allowed:
         print("[ERROR] robots.txt disallows scraping the required endpoints. Aborting.")
         sys.exit(1)
 
+    if args.compare_prefixes:
+        compare_prefix_strategies()
+        return
+
     # 2. gather names
-    names = get_all_scientific_names()
+    names = load_names(args.names_file, args.refresh_names, args.prefixes)
     if not names:
         print("[ERROR] no names discovered; aborting.")
         sys.exit(1)
 
-    # For robustness: optionally dedupe and sort
+    # For robustness: optionally dedupe and sort, then skip finished ones
     names = sorted(set(names))
-    print(f"[INFO] total names to scrape: {len(names)}")
+    done = load_checkpoint(args.output)
+    todo = [n for n in names if n not in done]
+    print(f"[INFO] total names: {len(names)}, already saved: {len(names) - len(todo)}, to scrape: {len(todo)}")
 
-    # 3. iterate and scrape
-    for name in tqdm(names, desc="Plants"):
-        try:
-            html = post_search_for_name(name)
-            if not html:
-                time.sleep(RATE_LIMIT_SECONDS)
+    # 3. scrape concurrently; only this thread writes the output file
+    pool = ThreadPoolExecutor(max_workers=WORKERS)
+    futures = {pool.submit(scrape_name, name): name for name in todo}
+    try:
+        for fut in tqdm(as_completed(futures), total=len(futures), desc="Plants"):
+            name = futures[fut]
+            try:
+                record = fut.result()
+            except Exception as e:
+                print(f"[ERROR] general error for '{name}': {e}")
                 continue
+            if record:
+                save_jsonl(record, args.output)
+    except KeyboardInterrupt:
+        print("\n[INTERRUPT] Stopping early; rerun to resume.")
+        pool.shutdown(wait=False, cancel_futures=True)
+        sys.exit(1)
+    pool.shutdown()
 
-            record = parse_species_html(html)
-            # add metadata
-            record["_harvested_name"] = name
-            record["_source_search_url"] = SEARCH_RESULTS
-            record["_retrieved_at"] = time.strftime("%Y-%m-%d %H:%M:%S")
-
-            save_jsonl(record)
-
-            # optionally download images
-            if DOWNLOAD_IMAGES and record.get("images"):
-                for url in record["images"]:
-                    download_image(url)
-
-            time.sleep(RATE_LIMIT_SECONDS)
-        except KeyboardInterrupt:
-            print("\n[INTERRUPT] Stopping early.")
-            break
-        except Exception as e:
-            print(f"[ERROR] general error for '{name}': {e}")
-            # continue to next name
-            time.sleep(RATE_LIMIT_SECONDS)
-
-    print("[DONE] scraping finished. Output:", OUTPUT_FILE)
+    print("[DONE] scraping finished. Output:", args.output)
     if DOWNLOAD_IMAGES:
         print("[DONE] images saved in:", IMAGES_DIR)
 
 if __name__ == "__main__":
     main()
-
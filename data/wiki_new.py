@@ -1,32 +1,150 @@
+import argparse
 import json
+import os
 import re
+import threading
 import requests
-import wikipediaapi
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from requests.adapters import HTTPAdapter, Retry
 from tqdm import tqdm
 
+from archive import ARCHIVE_DIR, ResponseArchive, request_key
+from jsonl import JsonlWriter, compact_jsonl, read_jsonl
+
 
 # ==================================================
 # 1. WIKIPEDIA API INIT (USER AGENT REQUIRED)
 # ==================================================
 USER_AGENT = "MedLeaf-LLM-Dataset/1.0 (academic research; India)"
+API_URL = "https://en.wikipedia.org/w/api.php"
+
+INPUT_FILE = "bsi_medicinal_plants.json"
+OUTPUT_FILE = "bsi_medicinal_plants_with_wikipedia.json"
+
+WORKERS = 4          # concurrent API requests
+BATCH_SIZE = 50      # titles per existence query (API limit for normal clients)
+# Error prefix of records that failed on a request (not a missing page);
+# a rerun retries them instead of counting them as done
+REQUEST_FAILED = "Wikipedia request failed"
+
+session = requests.Session()
+session.headers.update({"User-Agent": USER_AGENT})
+retries = Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504])
+session.mount("https://", HTTPAdapter(max_retries=retries, pool_maxsize=WORKERS))
 
-wiki = wikipediaapi.Wikipedia(
-    language="en",
-    user_agent=USER_AGENT
-)
+# Every API response is kept in the archive, which doubles as the on-disk
+# HTTP cache: a request already in it is not sent again (unless refresh).
+# With offline=True (--reparse) the network is never used.
+archive = None
+offline = False
+refresh = False
+
+_stats = {"cached": 0, "fetched": 0}
+_stats_lock = threading.Lock()
 
 
 # ==================================================
-# 2. LOAD INPUT DATA
+# 2. MEDIAWIKI API
 # ==================================================
-with open("bsi_medicinal_plants.json", "r", encoding="utf-8") as f:
-    plants = json.load(f)
+
+def api_get(params, timeout=10):
+    params = {**params, "format": "json"}
+    key = request_key("GET", API_URL, params)
+
+    if archive is not None and (offline or not refresh):
+        body = archive.get(key)
+        if body is not None:
+            with _stats_lock:
+                _stats["cached"] += 1
+            return json.loads(body)
+    if offline:
+        raise LookupError(f"not in archive: {key}")
+
+    r = session.get(API_URL, params=params, timeout=timeout)
+    r.raise_for_status()
+    if archive is not None:
+        archive.put(key, r.content, kind="wikipedia_api")
+    with _stats_lock:
+        _stats["fetched"] += 1
+    return r.json()
+
+
+def query_titles(titles):
+    """
+    One existence query for up to BATCH_SIZE titles (titles=A|B|C).
+    Returns {title: resolved page title, or None if there is no page}.
+    """
+    data = api_get({
+        "action": "query",
+        "prop": "info",
+        "titles": "|".join(titles),
+        "redirects": 1,
+    })
+    q = data.get("query", {})
+    normalized = {n["from"]: n["to"] for n in q.get("normalized", [])}
+    redirects = {r["from"]: r["to"] for r in q.get("redirects", [])}
+    existing = {
+        p["title"] for page_id, p in q.get("pages", {}).items()
+        if int(page_id) >= 0 and "missing" not in p and "invalid" not in p
+    }
+
+    resolved = {}
+    for t in titles:
+        target = normalized.get(t, t)
+        target = redirects.get(target, target)
+        resolved[t] = target if target in existing else None
+    return resolved
+
+
+def resolve_titles(titles, pool):
+    """
+    {title: resolved title | None | the exception that failed its batch}
+    for every distinct title, batched and queried concurrently.
+    """
+    # "|" separates titles and can never be part of one
+    titles = list(dict.fromkeys(t for t in titles if t and "|" not in t))
+    batches = [titles[i:i + BATCH_SIZE] for i in range(0, len(titles), BATCH_SIZE)]
+
+    def run(batch):
+        try:
+            return query_titles(batch)
+        except (requests.RequestException, LookupError, ValueError) as e:
+            return {t: e for t in batch}
+
+    resolved = {}
+    for result in pool.map(run, batches):
+        resolved.update(result)
+    return resolved
+
+
+def fetch_page(title):
+    """
+    Plain-text extract of a page (following redirects), or None if it
+    does not exist. Same request wikipediaapi makes for page.summary /
+    page.sections.
+    """
+    data = api_get({
+        "action": "query",
+        "prop": "extracts",
+        "titles": title,
+        "explaintext": 1,
+        "exsectionformat": "wiki",
+        "redirects": 1,
+    })
+    for page_id, page in data.get("query", {}).get("pages", {}).items():
+        if int(page_id) < 0 or "missing" in page or "invalid" in page:
+            return None
+        return page
+    return None
 
 
 # ==================================================
 # 3. HELPER FUNCTIONS
 # ==================================================
 
+SECTION_RE = re.compile(r"\n\n *(==+) (.*?) (==+) *\n")
+
+
 def normalize_scientific_name(name):
     """
     Remove author citations → Genus species
@@ -52,113 +170,210 @@ def clean_text(text):
 
 def extract_all_sections(page):
     """
-    Recursively extract ALL headers and subheaders
+    (summary, {section title: text}) for ALL headers and subheaders,
+    split out of the "== Title ==" markers of the extract
     """
-    sections = {}
-
-    def recurse(section):
-        sections[section.title] = clean_text(section.text)
-        for sub in section.sections:
-            recurse(sub)
+    extract = page.get("extract") or ""
+    matches = list(SECTION_RE.finditer(extract))
 
-    for sec in page.sections:
-        recurse(sec)
+    summary = extract[:matches[0].start()] if matches else extract
+    sections = {}
+    for i, m in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(extract)
+        sections[m.group(2)] = clean_text(extract[m.end():end])
 
-    return sections
+    return clean_text(summary), sections
 
 
 def mediawiki_search(query, limit=3):
     """
     Wikipedia search using MediaWiki API
     """
-    url = "https://en.wikipedia.org/w/api.php"
     params = {
         "action": "query",
         "list": "search",
         "srsearch": query,
-        "format": "json",
         "srlimit": limit
     }
 
-    headers = {"User-Agent": USER_AGENT}
-
     try:
-        r = requests.get(url, params=params, headers=headers, timeout=10)
-        data = r.json()
+        data = api_get(params)
         return [item["title"] for item in data.get("query", {}).get("search", [])]
     except Exception:
         return []
 
 
-def resolve_page(scientific_name):
-    """
-    Resolution strategy:
-    1. Direct species page
-    2. Wikipedia search API
-    3. Genus page
-    """
-    # 1. Direct lookup
-    page = wiki.page(scientific_name)
-    if page.exists():
-        return page, "species"
+def page_data(title):
+    """(error, wikipedia_data fields) for a resolved page title."""
+    try:
+        page = fetch_page(title)
+    except (requests.RequestException, LookupError, ValueError) as e:
+        return f"{REQUEST_FAILED}: {e}", None
+    if not page:
+        return "Wikipedia page not found", None
 
-    # 2. Search fallback
-    titles = mediawiki_search(scientific_name)
-    for title in titles:
-        page = wiki.page(title)
-        if page.exists():
-            return page, "search"
+    summary, sections = extract_all_sections(page)
+    return None, {"page_title": page["title"], "summary": summary, "sections": sections}
 
-    # 3. Genus fallback
-    genus = scientific_name.split()[0]
-    page = wiki.page(genus)
-    if page.exists():
-        return page, "genus"
 
-    return None, None
+def make_record(plant, normalized_name, wikipedia_data):
+    return {
+        "plant_name": plant.get("plant_name", ""),
+        "normalized_name": normalized_name,
+        "family": plant.get("family", ""),
+        "common_name": plant.get("common_name", ""),
+        "wikipedia_data": wikipedia_data
+    }
 
 
-# ==================================================
-# 4. SCRAPING LOOP
-# ==================================================
-
-output = []
+def request_failed(record):
+    """True for a record whose lookup failed on a request error (worth retrying)."""
+    error = (record.get("wikipedia_data") or {}).get("error") or ""
+    return error.startswith(REQUEST_FAILED)
 
-for plant in tqdm(plants, desc="Scraping Wikipedia"):
-    original_name = plant.get("plant_name", "")
-    family = plant.get("family", "")
-    common_name = plant.get("common_name", "")
 
-    normalized_name = normalize_scientific_name(original_name)
+def enrich(plants, todo=None, process_pool=None):
+    """
+    Resolution strategy, per plant:
+    1. Direct species page
+    2. Wikipedia search API
+    3. Genus page
 
-    page, source = resolve_page(normalized_name)
+    Done stage by stage over all plants rather than plant by plant: page
+    existence is checked BATCH_SIZE titles per request, every distinct
+    title (e.g. a genus shared by many species) is resolved and fetched
+    once, and requests run on WORKERS threads. Full extracts are one page
+    per request (the API only batches intro extracts).
 
-    if not page:
-        wikipedia_data = {
-            "error": "Wikipedia page not found"
-        }
-    else:
-        wikipedia_data = {
-            "page_title": page.title,
-            "summary": clean_text(page.summary),
-            "sections": extract_all_sections(page),
-            "source": source
-        }
-
-    output.append({
-        "plant_name": original_name,
-        "normalized_name": normalized_name,
-        "family": family,
-        "common_name": common_name,
-        "wikipedia_data": wikipedia_data
-    })
+    Yields (plant index, record) for the plants in `todo` (default: all)
+    as soon as each is complete, so not in input order. Page texts are
+    not kept once their records are out.
+    """
+    todo = list(range(len(plants))) if todo is None else list(todo)
+    names = {i: normalize_scientific_name(plants[i].get("plant_name", "")) for i in todo}
+    found = {}     # plant index -> (resolved title, source)
+    errors = {}    # plant index -> error message
+
+    def settle(i, resolved, source):
+        if isinstance(resolved, Exception):
+            errors[i] = f"{REQUEST_FAILED}: {resolved}"
+        elif resolved:
+            found[i] = (resolved, source)
+        return i in found or i in errors
+
+    with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+        # 1. Direct lookup
+        species = resolve_titles(list(names.values()), pool)
+        pending = [i for i in todo if not settle(i, species.get(names[i]), "species")]
+
+        # 2. Search fallback
+        results = list(pool.map(mediawiki_search, [names[i] for i in pending]))
+        candidates = resolve_titles([t for titles in results for t in titles], pool)
+        still = []
+        for i, titles in zip(pending, results):
+            if not any(settle(i, candidates.get(t), "search") for t in titles):
+                still.append(i)
+
+        # 3. Genus fallback (each genus resolved once)
+        genera = {i: (names[i].split() or [""])[0] for i in still}
+        genus_pages = resolve_titles(list(genera.values()), pool)
+        for i, genus in genera.items():
+            settle(i, genus_pages.get(genus), "genus")
+
+        for i in todo:
+            if i not in found:
+                error = errors.get(i, "Wikipedia page not found")
+                yield i, make_record(plants[i], names[i], {"error": error})
+
+        # Extracts, once per distinct page
+        by_title = {}
+        for i, (title, _) in found.items():
+            by_title.setdefault(title, []).append(i)
+        titles = sorted(by_title)
+
+        mapper = process_pool or pool
+        for title, (error, data) in zip(titles, mapper.map(page_data, titles)):
+            for i in by_title[title]:
+                if data is None:
+                    wikipedia_data = {"error": error}
+                else:
+                    wikipedia_data = {**data, "source": found[i][1]}
+                yield i, make_record(plants[i], names[i], wikipedia_data)
+
+
+def _init_offline(folder, api_url):
+    global archive, offline, API_URL
+    archive = ResponseArchive(folder, readonly=True)
+    offline = True
+    API_URL = api_url
 
 
 # ==================================================
-# 5. SAVE OUTPUT
+# 4. SCRAPING LOOP
 # ==================================================
 
-with open("bsi_medicinal_plants_with_wikipedia.json", "w", encoding="utf-8") as f:
-    json.dump(output, f, indent=2, ensure_ascii=False)
-
-print("\n✅ Wikipedia scraping completed successfully")
+def main():
+    global archive, offline, refresh, API_URL, WORKERS
+
+    parser = argparse.ArgumentParser(description="Attach Wikipedia text to the BSI plant list")
+    parser.add_argument("--input", default=INPUT_FILE)
+    parser.add_argument("--output", default=OUTPUT_FILE)
+    parser.add_argument("--jsonl", help="streaming output (default: --output with .jsonl)")
+    parser.add_argument("--no-compact", action="store_true", help="leave the JSONL, skip writing the JSON array")
+    parser.add_argument("--api", default=API_URL, help="MediaWiki api.php URL")
+    parser.add_argument("--archive", default=ARCHIVE_DIR, help="raw response archive folder")
+    parser.add_argument("--no-archive", action="store_true", help="do not archive / cache API responses")
+    parser.add_argument("--refresh", action="store_true", help="ignore cached responses and re-fetch")
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--reparse", action="store_true",
+                        help="rebuild the output from the archive only (no network), in parallel")
+    args = parser.parse_args()
+    API_URL = args.api
+    WORKERS = args.workers
+    refresh = args.refresh
+
+    with open(args.input, "r", encoding="utf-8") as f:
+        plants = json.load(f)
+
+    # Records stream to a JSONL file (with their input position in
+    # "_index"); a rerun picks up the plants that are not in it yet
+    jsonl_path = args.jsonl or os.path.splitext(args.output)[0] + ".jsonl"
+    if args.reparse and os.path.exists(jsonl_path):
+        os.remove(jsonl_path)
+    done = {rec["_index"] for _, rec in read_jsonl(jsonl_path)
+            if "_index" in rec and not request_failed(rec)}
+    todo = [i for i in range(len(plants)) if i not in done]
+    print(f"[INFO] {len(plants)} plants, {len(done)} already in {jsonl_path}, {len(todo)} to do")
+
+    procs = None
+    if args.reparse:
+        # Same requests, answered from the archive; pages are split into
+        # sections on one process per core
+        archive = ResponseArchive(args.archive, readonly=True)
+        offline = True
+        procs = ProcessPoolExecutor(max_workers=os.cpu_count(), initializer=_init_offline,
+                                    initargs=(args.archive, API_URL))
+    elif not args.no_archive:
+        archive = ResponseArchive(args.archive)
+
+    with JsonlWriter(jsonl_path) as out:
+        for i, record in tqdm(enrich(plants, todo, procs), total=len(todo), desc="Wikipedia"):
+            out.write({**record, "_index": i})
+    if procs is not None:
+        procs.shutdown()
+
+    print(f"[INFO] API requests: {_stats['fetched']} sent, {_stats['cached']} answered from cache")
+
+    # ==================================================
+    # 5. SAVE OUTPUT
+    # ==================================================
+
+    if not args.no_compact:
+        n = compact_jsonl(jsonl_path, args.output, sort_key="_index", drop=["_index"])
+        print(f"[INFO] wrote {n} records to {args.output}")
+
+    print("\n✅ Wikipedia scraping completed successfully")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""
+Direct disease -> ranked plants index for Medicinal Plant Support mode.
+
+Built once from plant_disease_support.json and cached as JSON next to
+the other compiled artifacts. Lookups are dict reads; fuzzy and
+multi-disease lookups are set intersections over token / plant sets.
+
+Plants are ranked non-toxic first, then by how many records support the
+plant for that disease, then by first appearance in the source file.
+
+    python -m ml.disease_index build data/plant_disease_support.json
+    python -m ml.disease_index bench data/plant_disease_support.json data/disease_support_model.pkl
+"""
+import argparse
+import difflib
+import json
+import os
+import pickle
+import re
+import time
+from pathlib import Path
+
+from rag.embedding_store import file_hash
+
+INDEX_VERSION = 1
+INDEX_FILE = "disease_index.json"
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def normalize_disease(text):
+    return " ".join(_TOKEN_RE.findall(str(text).lower()))
+
+
+def build_disease_index(records):
+    diseases = {}      # key -> display name
+    entries = {}       # key -> plant -> entry
+
+    for order, r in enumerate(records):
+        key = normalize_disease(r.get("disease", ""))
+        plant = r.get("plant_name")
+        if not key or not plant:
+            continue
+
+        diseases.setdefault(key, r["disease"])
+        plants = entries.setdefault(key, {})
+
+        e = plants.get(plant)
+        if e is None:
+            e = plants[plant] = {
+                "plant_name": plant,
+                "plant_part": r.get("plant_part"),
+                "plant_parts": [],
+                "family": r.get("family"),
+                "toxicity": bool(r.get("toxicity")),
+                "evidence": 0,
+                "_order": order,
+            }
+        e["evidence"] += 1
+        if r.get("plant_part") and r["plant_part"] not in e["plant_parts"]:
+            e["plant_parts"].append(r["plant_part"])
+        e["toxicity"] = e["toxicity"] or bool(r.get("toxicity"))
+
+    ranked = {}
+    for key, plants in entries.items():
+        rows = sorted(plants.values(), key=lambda e: (e["toxicity"], -e["evidence"], e["_order"]))
+        for e in rows:
+            del e["_order"]
+        ranked[key] = rows
+
+    tokens = {}
+    for key in ranked:
+        for t in key.split():
+            tokens.setdefault(t, []).append(key)
+
+    return {
+        "version": INDEX_VERSION,
+        "diseases": diseases,
+        "plants": ranked,
+        "tokens": tokens,
+    }
+
+
+class DiseaseIndex:
+    def __init__(self, data):
+        self.data = data
+        self.names = data["diseases"]
+        self.plants = data["plants"]
+        self.tokens = {t: set(keys) for t, keys in data["tokens"].items()}
+        self.plant_sets = {k: {e["plant_name"] for e in v} for k, v in self.plants.items()}
+
+    def diseases(self):
+        """Display names, sorted."""
+        return sorted(self.names.values())
+
+    def resolve(self, query):
+        """Disease keys matching `query`: exact, then all-token, then close spelling."""
+        key = normalize_disease(query)
+        if key in self.plants:
+            return [key]
+
+        words = key.split()
+        if words:
+            sets = [self.tokens.get(w, set()) for w in words]
+            hits = set.intersection(*sets)
+            if hits:
+                return sorted(hits)
+
+        return difflib.get_close_matches(key, list(self.plants), n=3, cutoff=0.8)
+
+    def lookup(self, disease, limit=None):
+        """Ranked plant entries for one disease (fuzzy matched)."""
+        keys = self.resolve(disease)
+        if len(keys) == 1:
+            rows = self.plants[keys[0]]
+        else:
+            rows = self._merge(keys)
+        return rows[:limit] if limit else rows
+
+    def lookup_many(self, diseases, limit=None):
+        """Plants traditionally used for every one of `diseases`."""
+        keys = []
+        for d in diseases:
+            resolved = self.resolve(d)
+            if not resolved:
+                return []
+            keys.append(resolved)
+
+        # A plant qualifies if it covers at least one match of each disease
+        allowed = set.intersection(*[
+            set().union(*(self.plant_sets[k] for k in group)) for group in keys
+        ])
+        rows = self._merge([k for group in keys for k in group])
+        rows = [e for e in rows if e["plant_name"] in allowed]
+        return rows[:limit] if limit else rows
+
+    def _merge(self, keys):
+        merged = {}
+        for k in keys:
+            for e in self.plants[k]:
+                m = merged.get(e["plant_name"])
+                if m is None:
+                    merged[e["plant_name"]] = m = dict(e, plant_parts=list(e["plant_parts"]))
+                    m["evidence"] = 0
+                m["evidence"] += e["evidence"]
+                m["toxicity"] = m["toxicity"] or e["toxicity"]
+                for part in e["plant_parts"]:
+                    if part not in m["plant_parts"]:
+                        m["plant_parts"].append(part)
+
+        return sorted(merged.values(), key=lambda e: (e["toxicity"], -e["evidence"], e["plant_name"]))
+
+
+def load_disease_index(source_path, folder):
+    """Load the cached index for `source_path`, rebuilding it when stale."""
+    source_hash = file_hash(source_path)
+    path = Path(folder) / INDEX_FILE
+
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") == INDEX_VERSION and data.get("source_hash") == source_hash:
+            return DiseaseIndex(data)
+    except (OSError, ValueError):
+        pass
+
+    with open(source_path, "r", encoding="utf-8") as f:
+        data = build_disease_index(json.load(f))
+    data["source_hash"] = source_hash
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+    return DiseaseIndex(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the disease index against the classifier path")
+    parser.add_argument("command", choices=["build", "bench"])
+    parser.add_argument("source_path")
+    parser.add_argument("model_path", nargs="?")
+    parser.add_argument("--folder", default="data/compiled")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = load_disease_index(args.source_path, args.folder)
+    print(f"index: {len(index.plants)} diseases, loaded in {time.perf_counter() - start:.3f} s")
+
+    if args.command == "build":
+        return
+
+    with open(args.model_path, "rb") as f:
+        bundle = pickle.load(f)
+    model = bundle["model"]
+    encoder = bundle["disease_encoder"]
+    reference_df = bundle["reference_df"]
+    diseases = sorted(reference_df["disease"].unique())
+
+    start = time.perf_counter()
+    for d in diseases:
+        predicted = model.predict([[encoder.transform([d])[0]]])
+        reference_df[reference_df["plant_name"].isin(predicted)].drop_duplicates("plant_name").head(6)
+    model_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for d in diseases:
+        index.lookup(d, limit=6)
+    index_s = time.perf_counter() - start
+
+    n = len(diseases)
+    print(f"model path  {1e6 * model_s / n:9.1f} us/lookup")
+    print(f"index path  {1e6 * index_s / n:9.1f} us/lookup")
+
+
+if __name__ == "__main__":
+    main()
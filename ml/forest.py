@@ -0,0 +1,245 @@
+"""
+Array-backed predictor for the plant recommendation RandomForest.
+
+The pickled sklearn forest is flattened once into contiguous numpy node
+arrays (feature, threshold, left, right, value) and saved as a bundle
+(see rag/shared.py), which loads memory-mapped in milliseconds and can
+be shared between worker processes.
+
+    python -m ml.forest export data/plant_recommendation_model.pkl data/compiled
+    python -m ml.forest bench  data/plant_recommendation_model.pkl data/compiled
+"""
+import argparse
+import hashlib
+import pickle
+import time
+
+import numpy as np
+
+from rag.embedding_store import file_hash
+from rag.shared import load_bundle, save_bundle
+
+FEATURES = ["is_native", "carbon_score", "plant_type_enc", "climate_zone_enc"]
+BUNDLE_NAME = "forest"
+
+
+class ArrayLabelEncoder:
+    """Stand-in for a fitted LabelEncoder backed by its classes_ array."""
+
+    def __init__(self, classes):
+        self.classes_ = np.asarray(classes)
+
+    def transform(self, values):
+        values = np.asarray(values)
+        codes = np.searchsorted(self.classes_, values)
+        codes = np.minimum(codes, len(self.classes_) - 1)
+        if len(values) and not np.all(self.classes_[codes] == values):
+            unseen = sorted(set(values[self.classes_[codes] != values].tolist()))
+            raise ValueError(f"y contains previously unseen labels: {unseen}")
+        return codes
+
+
+def _flatten_tree(tree, max_depth=None, prune_tol=None):
+    """Node arrays of one sklearn tree, in preorder, with leaves looping to themselves."""
+    left = tree.children_left
+    right = tree.children_right
+    value = tree.value[:, 0, 0]
+    n = tree.node_count
+
+    is_leaf = left == -1
+
+    # sklearn numbers nodes in preorder, so parents come before children
+    depth = np.zeros(n, dtype=np.int32)
+    for i in range(n):
+        if not is_leaf[i]:
+            depth[left[i]] = depth[right[i]] = depth[i] + 1
+
+    if max_depth is not None:
+        # Internal nodes hold the mean of their subtree, so a capped node
+        # predicts what its samples averaged to
+        is_leaf = is_leaf | (depth >= max_depth)
+
+    if prune_tol is not None:
+        # Children before parents, so merges cascade upwards
+        for i in range(n - 1, -1, -1):
+            if (
+                not is_leaf[i]
+                and is_leaf[left[i]]
+                and is_leaf[right[i]]
+                and abs(value[left[i]] - value[right[i]]) <= prune_tol
+            ):
+                is_leaf[i] = True
+
+    keep = []
+    stack = [0]
+    while stack:
+        i = stack.pop()
+        keep.append(i)
+        if not is_leaf[i]:
+            stack.append(right[i])
+            stack.append(left[i])
+
+    keep = np.asarray(keep, dtype=np.int64)
+    remap = np.full(n, -1, dtype=np.int64)
+    remap[keep] = np.arange(len(keep))
+
+    leaf = is_leaf[keep]
+    own = np.arange(len(keep), dtype=np.int32)
+
+    return {
+        "feature": np.where(leaf, 0, tree.feature[keep]).astype(np.int32),
+        "threshold": np.where(leaf, 0.0, tree.threshold[keep]).astype(np.float64),
+        "left": np.where(leaf, own, remap[np.where(leaf, 0, left[keep])]).astype(np.int32),
+        "right": np.where(leaf, own, remap[np.where(leaf, 0, right[keep])]).astype(np.int32),
+        "value": value[keep].astype(np.float64),
+        "depth": int(depth[keep].max()) if len(keep) else 0,
+    }
+
+
+def flatten_forest(model, max_depth=None, prune_tol=None):
+    """Concatenate all trees of `model` into one set of node arrays."""
+    parts = [_flatten_tree(e.tree_, max_depth, prune_tol) for e in model.estimators_]
+
+    offsets = np.cumsum([0] + [len(p["value"]) for p in parts])
+    arrays = {
+        "feature": np.concatenate([p["feature"] for p in parts]),
+        "threshold": np.concatenate([p["threshold"] for p in parts]),
+        "left": np.concatenate([p["left"] + o for p, o in zip(parts, offsets)]).astype(np.int32),
+        "right": np.concatenate([p["right"] + o for p, o in zip(parts, offsets)]).astype(np.int32),
+        "value": np.concatenate([p["value"] for p in parts]),
+        "roots": offsets[:-1].astype(np.int32),
+    }
+    return arrays, max(p["depth"] for p in parts)
+
+
+class CompiledForest:
+    def __init__(self, arrays, meta):
+        self.feature = arrays["feature"]
+        self.threshold = arrays["threshold"]
+        self.left = arrays["left"]
+        self.right = arrays["right"]
+        self.value = arrays["value"]
+        self.roots = arrays["roots"]
+        self.depth = meta["depth"]
+        self.meta = meta
+        self.plant_type_encoder = ArrayLabelEncoder(arrays["plant_type_classes"])
+        self.climate_zone_encoder = ArrayLabelEncoder(arrays["climate_zone_classes"])
+
+    @property
+    def n_nodes(self):
+        return len(self.value)
+
+    def predict(self, X):
+        # sklearn compares float32 inputs against float64 thresholds
+        X = np.asarray(X, dtype=np.float32)
+        n = len(X)
+        if n == 0:
+            return np.zeros(0)
+
+        rows = np.arange(n)[:, None]
+        node = np.broadcast_to(self.roots, (n, len(self.roots))).copy()
+
+        # All samples walk all trees at once; leaves point to themselves
+        for _ in range(self.depth):
+            go_left = X[rows, self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+
+        leaf_values = self.value[node]
+
+        # Same accumulation order as RandomForestRegressor.predict
+        out = np.zeros(n)
+        for t in range(leaf_values.shape[1]):
+            out += leaf_values[:, t]
+        out /= leaf_values.shape[1]
+        return out
+
+
+def export_forest(bundle, folder, max_depth=None, prune_tol=None, source_hash=None):
+    """Flatten a pickled recommendation bundle into an array bundle."""
+    model = bundle["model"]
+    arrays, depth = flatten_forest(model, max_depth=max_depth, prune_tol=prune_tol)
+    arrays["plant_type_classes"] = np.asarray(bundle["plant_type_encoder"].classes_).astype(str)
+    arrays["climate_zone_classes"] = np.asarray(bundle["climate_zone_encoder"].classes_).astype(str)
+
+    meta = {
+        "source_hash": source_hash,
+        "n_trees": len(model.estimators_),
+        "depth": depth,
+        "max_depth": max_depth,
+        "prune_tol": prune_tol,
+        "features": FEATURES,
+    }
+    key = f"{source_hash}:{max_depth}:{prune_tol}"
+    meta["version"] = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+    return save_bundle(folder, BUNDLE_NAME, arrays, meta)
+
+
+def load_compiled_forest(folder):
+    arrays, meta = load_bundle(folder, BUNDLE_NAME)
+    return CompiledForest(arrays, meta)
+
+
+def _rss_mb():
+    import psutil
+
+    return psutil.Process().memory_info().rss / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile the recommendation forest into node arrays")
+    parser.add_argument("command", choices=["export", "bench"])
+    parser.add_argument("model_path")
+    parser.add_argument("folder")
+    parser.add_argument("--max-depth", type=int, default=None)
+    parser.add_argument("--prune-tol", type=float, default=None)
+    args = parser.parse_args()
+
+    if args.command == "export":
+        with open(args.model_path, "rb") as f:
+            bundle = pickle.load(f)
+        path = export_forest(
+            bundle, args.folder,
+            max_depth=args.max_depth, prune_tol=args.prune_tol,
+            source_hash=file_hash(args.model_path),
+        )
+        print(f"Saved compiled forest to {path}")
+        return
+
+    # Compiled first: the pickle's footprint would swamp the RSS delta
+    rss = _rss_mb()
+    start = time.perf_counter()
+    forest = load_compiled_forest(args.folder)
+    compiled_s = time.perf_counter() - start
+    compiled_mb = _rss_mb() - rss
+
+    rss = _rss_mb()
+    start = time.perf_counter()
+    with open(args.model_path, "rb") as f:
+        bundle = pickle.load(f)
+    pickle_s = time.perf_counter() - start
+    pickle_mb = _rss_mb() - rss
+
+    rng = np.random.default_rng(0)
+    X = np.column_stack([
+        rng.integers(0, 2, 5000),
+        rng.integers(0, 4, 5000),
+        rng.integers(0, len(forest.plant_type_encoder.classes_), 5000),
+        rng.integers(0, len(forest.climate_zone_encoder.classes_), 5000),
+    ]).astype(np.float64)
+
+    start = time.perf_counter()
+    expected = bundle["model"].predict(X)
+    sk_s = time.perf_counter() - start
+    start = time.perf_counter()
+    got = forest.predict(X)
+    arr_s = time.perf_counter() - start
+
+    print(f"pickle   load {pickle_s:7.3f} s  rss +{pickle_mb:7.1f} MB  predict {sk_s * 1000:7.1f} ms")
+    print(f"compiled load {compiled_s:7.3f} s  rss +{compiled_mb:7.1f} MB  predict {arr_s * 1000:7.1f} ms")
+    print(f"nodes {forest.n_nodes}, identical outputs: {np.array_equal(expected, got)}, "
+          f"max abs diff {np.abs(expected - got).max():.3g}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+Precomputed per-state recommendation tables for Step 5 of the Home flow.
+
+The model inputs (is_native, carbon_score, plant_type, climate_zone)
+are static dataset columns, so every plant is scored once offline and
+each state's candidates are stored already ranked by ml_score:
+
+    states   state names
+    offsets  state i owns rows[offsets[i]:offsets[i + 1]]
+    rows     dataset row numbers, best first
+    scores   ml_score of those rows
+
+The table is rebuilt automatically when the dataset or model changes.
+"""
+import argparse
+import hashlib
+import json
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from ml.forest import FEATURES, load_compiled_forest
+from rag.embedding_store import file_hash
+from rag.shared import bundle_path, load_bundle, save_bundle
+
+BUNDLE_NAME = "state_table"
+TABLE_VERSION = 1
+
+# Optional facets for the Purpose / Space answers, stored as row masks
+PURPOSE_FACETS = {
+    "Medicinal use": lambda p: bool(p.get("medicinal_uses")),
+    "Carbon absorption": lambda p: (p.get("carbon_score") or 0) > 0,
+}
+SPACE_FACETS = {
+    "Balcony / Indoor": lambda p: p.get("plant_type") in ("herb", "climber"),
+    "Small garden": lambda p: p.get("plant_type") in ("herb", "shrub", "climber"),
+}
+
+
+def score_frame(df, model, plant_encoder, climate_encoder):
+    """ml_score for every row of the dataset frame, as Step 5 computes it."""
+    X = df[["origin_type", "carbon_score", "plant_type", "climate_zone"]].copy()
+
+    X["is_native"] = (X["origin_type"] == "native").astype(int)
+    X["carbon_score"] = X["carbon_score"].fillna(0)
+    X["plant_type_enc"] = plant_encoder.transform(X["plant_type"].fillna("unknown"))
+    X["climate_zone_enc"] = climate_encoder.transform(X["climate_zone"].fillna("unknown"))
+
+    return np.asarray(model.predict(X[FEATURES]), dtype=np.float64)
+
+
+def build_state_table(df, scores, facets=None):
+    states = sorted({
+        s for v in df["suitable_states"] if isinstance(v, list) for s in v
+    })
+    members = {s: [] for s in states}
+    for i, v in enumerate(df["suitable_states"]):
+        if isinstance(v, list):
+            for s in set(v):
+                members[s].append(i)
+
+    rows, offsets = [], [0]
+    for s in states:
+        idx = np.asarray(members[s], dtype=np.int64)
+        # The same sort Step 5 ran on its candidate frame (pandas'
+        # default, not stable), so tied plants come out in the same order
+        order = pd.Series(scores[idx]).sort_values(ascending=False).index
+        idx = idx[np.asarray(order)]
+        rows.append(idx)
+        offsets.append(offsets[-1] + len(idx))
+
+    rows = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64)
+    arrays = {
+        "states": np.asarray(states, dtype=str),
+        "offsets": np.asarray(offsets, dtype=np.int64),
+        "rows": rows.astype(np.int32),
+        "scores": scores[rows],
+    }
+
+    if facets:
+        records = df.to_dict("records")
+        arrays["facet_names"] = np.asarray(list(facets), dtype=str)
+        arrays["facet_masks"] = np.array(
+            [[bool(fn(p)) for p in records] for fn in facets.values()], dtype=bool
+        )
+
+    return arrays
+
+
+class StateTable:
+    def __init__(self, arrays, meta):
+        self.states = [str(s) for s in arrays["states"]]
+        self.offsets = arrays["offsets"]
+        self.rows = arrays["rows"]
+        self.scores = arrays["scores"]
+        self.meta = meta
+        self._state_pos = {s: i for i, s in enumerate(self.states)}
+
+        self.facets = {}
+        if "facet_names" in arrays:
+            for name, mask in zip(arrays["facet_names"], arrays["facet_masks"]):
+                self.facets[str(name)] = mask
+
+    def top(self, state, n=5, facets=()):
+        """[(row, ml_score)] of the n best plants for `state`."""
+        i = self._state_pos.get(state)
+        if i is None:
+            return []
+
+        rows = self.rows[self.offsets[i]:self.offsets[i + 1]]
+        scores = self.scores[self.offsets[i]:self.offsets[i + 1]]
+
+        for name in facets:
+            if name in self.facets:
+                keep = self.facets[name][rows]
+                rows, scores = rows[keep], scores[keep]
+
+        return [(int(r), float(s)) for r, s in zip(rows[:n], scores[:n])]
+
+
+def load_state_table(folder, df, dataset_hash, model_hash, model,
+                     plant_encoder, climate_encoder, facets=None):
+    """
+    Open the saved table, rebuilding it first when it was made from a
+    different dataset or model (or is missing).
+    """
+    if bundle_path(folder, BUNDLE_NAME):
+        arrays, meta = load_bundle(folder, BUNDLE_NAME)
+        if (
+            meta.get("format") == TABLE_VERSION
+            and meta.get("dataset_hash") == dataset_hash
+            and meta.get("model_hash") == model_hash
+            and meta.get("facets") == sorted(facets or [])
+        ):
+            return StateTable(arrays, meta)
+
+    # Accepts the columnar corpus too; it is only materialised to rebuild
+    if not isinstance(df, pd.DataFrame):
+        df = df.to_frame()
+
+    scores = score_frame(df, model, plant_encoder, climate_encoder)
+    arrays = build_state_table(df, scores, facets)
+
+    key = f"{dataset_hash}:{model_hash}:{sorted(facets or [])}"
+    meta = {
+        "version": hashlib.sha1(key.encode("utf-8")).hexdigest()[:16],
+        "format": TABLE_VERSION,
+        "dataset_hash": dataset_hash,
+        "model_hash": model_hash,
+        "facets": sorted(facets or []),
+    }
+    save_bundle(folder, BUNDLE_NAME, arrays, meta)
+
+    arrays, meta = load_bundle(folder, BUNDLE_NAME)
+    return StateTable(arrays, meta)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the per-state recommendation table")
+    parser.add_argument("dataset_path")
+    parser.add_argument("model_path", help="pickled bundle, or a folder with a compiled forest")
+    parser.add_argument("folder")
+    parser.add_argument("--facets", action="store_true", help="store purpose / space facets")
+    args = parser.parse_args()
+
+    with open(args.dataset_path, "r", encoding="utf-8") as f:
+        df = pd.DataFrame(json.load(f))
+
+    if bundle_path(args.model_path, "forest"):
+        model = load_compiled_forest(args.model_path)
+        plant_encoder, climate_encoder = model.plant_type_encoder, model.climate_zone_encoder
+        model_hash = model.meta["version"]
+    else:
+        with open(args.model_path, "rb") as f:
+            bundle = pickle.load(f)
+        model = bundle["model"]
+        plant_encoder, climate_encoder = bundle["plant_type_encoder"], bundle["climate_zone_encoder"]
+        model_hash = file_hash(args.model_path)
+
+    facets = {**PURPOSE_FACETS, **SPACE_FACETS} if args.facets else None
+    table = load_state_table(
+        args.folder, df, file_hash(args.dataset_path), model_hash,
+        model, plant_encoder, climate_encoder, facets=facets,
+    )
+    print(f"State table: {len(table.states)} states, {len(table.rows)} ranked rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+Disk-backed cache of generated answers (SQLite, survives restarts).
+
+An answer is keyed on the ordered names of the retrieved plants plus
+the question, so a paraphrase that retrieves the same plants reuses the
+answer. The question part is its normalised word set (lower case,
+punctuation and stop words dropped, sorted). When the query embedding
+is passed it is stored with the answer, and a question with other words
+that retrieved the same plants reuses the answer only if the cosine
+similarity of the two embeddings is at least SIMILARITY.
+
+Rows belong to a namespace made of the corpus version and a hash of
+the prompt / answer templates. Opening the cache with a different
+namespace deletes the old rows, so a new corpus or template never
+serves stale answers. Entries also expire after `ttl` seconds, and the
+least recently used ones are dropped beyond `max_entries`.
+
+    python -m rag.answer_cache stats data/compiled/answer_cache.sqlite
+"""
+import argparse
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+from rag.generator import MODEL_NAME, generate_answer
+from rag.prompt_builder import CONTEXT_TOKENS, FIELDS, build_prompt
+
+MAX_ENTRIES = 10000
+TTL = 7 * 24 * 3600     # seconds
+SIMILARITY = 0.95
+SCHEMA = 2              # PRAGMA user_version; older tables are dropped
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+STOP_WORDS = {
+    "a", "an", "the", "is", "are", "was", "be", "for", "of", "in", "on", "to", "and",
+    "or", "with", "which", "what", "that", "do", "does", "can", "i", "my", "me",
+    "some", "any", "please", "tell", "about", "good", "best", "plants", "plant",
+}
+
+
+def normalize_question(query):
+    """Sorted distinct content words: "Plants good for cough?" -> "cough"."""
+    words = {w for w in _WORD_RE.findall(query.lower()) if w not in STOP_WORDS}
+    return " ".join(sorted(words))
+
+
+def _unit(embedding):
+    embedding = np.asarray(embedding, dtype=np.float32)
+    return embedding / (np.linalg.norm(embedding) or 1.0)
+
+
+def template_hash():
+    """Changes whenever build_prompt(), generate_answer(), context packing or the model change."""
+    sample = [{"plant_name": "{plant}", "common_name": "{common}", "origin_type": "{origin}",
+               "medicinal_uses": "{uses}", "carbon_score": "{carbon}", "risk_notes": "{risk}"}]
+    text = (build_prompt("{query}", "{context}") + generate_answer("{query}", sample)
+            + f"{FIELDS}{CONTEXT_TOKENS}" + MODEL_NAME)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+class AnswerCache:
+    def __init__(self, path, corpus_version, max_entries=MAX_ENTRIES, ttl=TTL):
+        self.namespace = f"{corpus_version}:{template_hash()}"
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(path), timeout=10, check_same_thread=False)
+        with self._lock, self.db:
+            self.db.execute("PRAGMA journal_mode=WAL")
+            (version,) = self.db.execute("PRAGMA user_version").fetchone()
+            if version != SCHEMA:
+                self.db.execute("DROP TABLE IF EXISTS answers")
+                self.db.execute(f"PRAGMA user_version = {SCHEMA}")
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS answers ("
+                " key TEXT PRIMARY KEY, namespace TEXT, kind TEXT, plants TEXT,"
+                " embedding BLOB, answer TEXT, created REAL, accessed REAL)"
+            )
+            self.db.execute("CREATE INDEX IF NOT EXISTS answers_accessed ON answers (accessed)")
+            self.db.execute("CREATE INDEX IF NOT EXISTS answers_plants ON answers (plants)")
+            # Answers made from another corpus or template
+            self.db.execute("DELETE FROM answers WHERE namespace != ?", (self.namespace,))
+
+    def keys(self, kind, query, plants):
+        """(answer key, plant-list key): the first includes the question's word set."""
+        ids = [p["plant_name"] for p in plants]
+        raw = json.dumps([self.namespace, kind, ids], ensure_ascii=False)
+        plants_key = hashlib.sha1(raw.encode("utf-8")).hexdigest()
+        raw = json.dumps([plants_key, normalize_question(query)], ensure_ascii=False)
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest(), plants_key
+
+    def _lookup(self, key, plants_key, embedding, now):
+        row = self.db.execute(
+            "SELECT key, answer FROM answers WHERE key = ? AND created >= ?",
+            (key, now - self.ttl),
+        ).fetchone()
+        if row is not None or embedding is None:
+            return row
+
+        # Other wording, same plants: the closest stored question, if close enough
+        best, best_sim = None, SIMILARITY
+        for row_key, blob, answer in self.db.execute(
+            "SELECT key, embedding, answer FROM answers"
+            " WHERE plants = ? AND embedding IS NOT NULL AND created >= ?",
+            (plants_key, now - self.ttl),
+        ):
+            stored = np.frombuffer(blob, dtype=np.float32)
+            if len(stored) != len(embedding):
+                continue
+            sim = float(stored @ embedding)
+            if sim >= best_sim:
+                best, best_sim = (row_key, answer), sim
+        return best
+
+    def get(self, kind, query, plants, embedding=None):
+        now = time.time()
+        key, plants_key = self.keys(kind, query, plants)
+        if embedding is not None:
+            embedding = _unit(embedding)
+
+        with self._lock, self.db:
+            row = self._lookup(key, plants_key, embedding, now)
+            if row is None:
+                self.misses += 1
+                return None
+
+            self.db.execute("UPDATE answers SET accessed = ? WHERE key = ?", (now, row[0]))
+            self.hits += 1
+            return row[1]
+
+    def put(self, kind, query, plants, answer, embedding=None):
+        now = time.time()
+        key, plants_key = self.keys(kind, query, plants)
+        blob = None if embedding is None else _unit(embedding).tobytes()
+
+        with self._lock, self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, self.namespace, kind, plants_key, blob, answer, now, now),
+            )
+            self.db.execute("DELETE FROM answers WHERE created < ?", (now - self.ttl,))
+            (count,) = self.db.execute("SELECT COUNT(*) FROM answers").fetchone()
+            if count > self.max_entries:
+                self.db.execute(
+                    "DELETE FROM answers WHERE key IN "
+                    "(SELECT key FROM answers ORDER BY accessed LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+
+    def clear(self):
+        with self._lock, self.db:
+            self.db.execute("DELETE FROM answers")
+
+    def stats(self):
+        with self._lock:
+            (size,) = self.db.execute("SELECT COUNT(*) FROM answers").fetchone()
+            lookups = self.hits + self.misses
+            return {
+                "size": size,
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or clear the answer cache")
+    parser.add_argument("command", choices=["stats", "clear"])
+    parser.add_argument("path")
+    args = parser.parse_args()
+
+    db = sqlite3.connect(args.path)
+    if args.command == "clear":
+        with db:
+            db.execute("DELETE FROM answers")
+    for namespace, kind, n in db.execute(
+        "SELECT namespace, kind, COUNT(*) FROM answers GROUP BY namespace, kind"
+    ):
+        print(f"{namespace}  {kind:9s} {n}")
+    print(f"template hash now: {template_hash()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+HTTP client for service.py. app.py uses it in place of the local models
+when PLANTMATCH_SERVICE_URL is set (e.g. http://127.0.0.1:8000).
+"""
+import requests
+
+TIMEOUT = 30    # seconds
+
+
+class ServiceClient:
+    def __init__(self, base_url, timeout=TIMEOUT):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def _get(self, path, **params):
+        params = {k: v for k, v in params.items() if v is not None}
+        r = self.session.get(self.base_url + path, params=params, timeout=self.timeout)
+        r.raise_for_status()
+        return r.json()
+
+    def retrieve(self, query, top_k=5, state=None, native_only=True):
+        r = self.session.post(
+            self.base_url + "/retrieve",
+            json={"query": query, "top_k": top_k, "state": state, "native_only": native_only},
+            timeout=self.timeout,
+        )
+        r.raise_for_status()
+        return r.json()
+
+    def recommend(self, state, n=5):
+        """Plant records with their "ml_score", best first."""
+        return self._get(f"/recommend/{requests.utils.quote(state, safe='')}", n=n)
+
+    def disease(self, name, limit=None):
+        return self._get(f"/disease/{requests.utils.quote(name, safe='')}", limit=limit)
+
+    def version(self):
+        return self._get("/version")["corpus_version"]
+
+    def states(self):
+        return self._get("/states")
+
+    def diseases(self):
+        return self._get("/diseases")
@@ -0,0 +1,291 @@
+"""
+Columnar, memory-mapped form of plant_ai_dataset_v2_native_state.json.
+
+The JSON dataset is compiled once (and again whenever its hash changes)
+into a rag.shared bundle:
+
+    category columns   int16 codes, categories kept in meta.json
+    bool / number      plain numpy columns
+    suitable_states    uint64 bitmask words, state names in meta.json
+    text columns       one UTF-8 blob + int64 offsets per column
+    other lists        JSON-encoded text columns
+
+Loading maps the arrays read-only; records and columns are decoded only
+when asked for.
+
+    python -m rag.corpus bench data/plant_ai_dataset_v2_native_state.json
+"""
+import argparse
+import json
+import time
+from collections.abc import Sequence
+
+import numpy as np
+
+from rag.embedding_store import file_hash
+from rag.shared import bundle_path, load_bundle, save_bundle
+
+CORPUS_VERSION = 1
+BUNDLE_NAME = "corpus"
+# Corpus + embedding matrix published for worker processes (rag/shared.py)
+PUBLISHED_NAME = "published_corpus"
+
+SCHEMA = {
+    "plant_name": "text",
+    "common_name": "text",
+    "family": "category",
+    "origin_type": "category",
+    "promote_native": "bool",
+    "suitable_states": "states",
+    "plant_type": "category",
+    "climate_zone": "category",
+    "carbon_score": "number",
+    "medicinal_uses": "json",
+    "risk_notes": "text",
+    "knowledge_text": "text",
+}
+
+_CHECKS = {
+    "text": lambda v: isinstance(v, str),
+    "category": lambda v: isinstance(v, str),
+    "bool": lambda v: isinstance(v, bool),
+    "number": lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+    "states": lambda v: isinstance(v, list) and all(isinstance(s, str) for s in v),
+    "json": lambda v: True,
+}
+
+
+def _encode_text(values):
+    chunks = [v.encode("utf-8") for v in values]
+    offsets = np.zeros(len(chunks) + 1, dtype=np.int64)
+    np.cumsum([len(c) for c in chunks], out=offsets[1:])
+    return np.frombuffer(b"".join(chunks), dtype=np.uint8), offsets
+
+
+def compile_columns(plants):
+    """(arrays, columns meta) for a list of plant records."""
+    names = []
+    for p in plants:
+        for k in p:
+            if k not in names:
+                names.append(k)
+
+    arrays = {}
+    columns = []
+    n = len(plants)
+
+    for name in names:
+        present = [name in p for p in plants]
+        values = [p.get(name) for p in plants]
+
+        kind = SCHEMA.get(name, "json")
+        if not all(present) or not all(_CHECKS[kind](v) for v in values):
+            kind = "json"
+
+        col = {"name": name, "kind": kind}
+        key = f"col{len(columns)}"
+
+        if kind == "category":
+            categories = sorted(set(values))
+            lookup = {c: i for i, c in enumerate(categories)}
+            arrays[key] = np.fromiter((lookup[v] for v in values), dtype=np.int16, count=n)
+            col["categories"] = categories
+
+        elif kind == "bool":
+            arrays[key] = np.asarray(values, dtype=bool)
+
+        elif kind == "number":
+            if all(isinstance(v, int) for v in values):
+                arrays[key] = np.asarray(values, dtype=np.int64)
+            else:
+                arrays[key] = np.asarray(values, dtype=np.float64)
+
+        elif kind == "states":
+            states = sorted({s for v in values for s in v})
+            bit = {s: i for i, s in enumerate(states)}
+            words = np.zeros((n, max(1, (len(states) + 63) // 64)), dtype=np.uint64)
+            for i, v in enumerate(values):
+                for s in v:
+                    words[i, bit[s] // 64] |= np.uint64(1 << (bit[s] % 64))
+            arrays[key] = words
+            col["states"] = states
+            # Original list order is not recoverable from a bitmask
+            arrays[key + "_json"], arrays[key + "_offsets"] = _encode_text(
+                [json.dumps(v, ensure_ascii=False) for v in values]
+            )
+
+        else:
+            texts = values if kind == "text" else [
+                json.dumps(v, ensure_ascii=False) for v in values
+            ]
+            arrays[key + "_blob"], arrays[key + "_offsets"] = _encode_text(texts)
+
+        col["key"] = key
+        col["missing"] = [i for i, ok in enumerate(present) if not ok]
+        columns.append(col)
+
+    return arrays, columns
+
+
+class Corpus(Sequence):
+    """Read-only plant records backed by memory-mapped columns."""
+
+    def __init__(self, arrays, meta):
+        self.arrays = arrays
+        self.meta = meta
+        self.columns = {c["name"]: c for c in meta["columns"]}
+        self.version = meta["source_hash"]
+
+        states = self.columns.get("suitable_states", {})
+        self.states = states.get("states", [])
+        self._state_bit = {s: i for i, s in enumerate(self.states)}
+        self._missing = {c["name"]: set(c["missing"]) for c in meta["columns"]}
+
+    def __len__(self):
+        return self.meta["rows"]
+
+    def _blob(self, key, i):
+        offsets = self.arrays[key + "_offsets"]
+        blob = self.arrays[key + ("_json" if key + "_json" in self.arrays else "_blob")]
+        return blob[int(offsets[i]):int(offsets[i + 1])].tobytes().decode("utf-8")
+
+    def value(self, i, name):
+        col = self.columns[name]
+        kind, key = col["kind"], col["key"]
+
+        if kind == "category":
+            return col["categories"][int(self.arrays[key][i])]
+        if kind == "bool":
+            return bool(self.arrays[key][i])
+        if kind == "number":
+            return self.arrays[key][i].item()
+        if kind == "text":
+            return self._blob(key, i)
+        return json.loads(self._blob(key, i))
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        return {
+            name: self.value(i, name)
+            for name in self.columns
+            if i not in self._missing[name]
+        }
+
+    def codes(self, name):
+        """(int16 codes, categories) of a category column."""
+        col = self.columns[name]
+        return self.arrays[col["key"]], col["categories"]
+
+    def state_mask(self, state):
+        """Boolean row mask of plants suitable for `state`."""
+        bit = self._state_bit.get(state)
+        if bit is None:
+            return np.zeros(len(self), dtype=bool)
+        words = self.arrays[self.columns["suitable_states"]["key"]]
+        return ((words[:, bit // 64] >> np.uint64(bit % 64)) & np.uint64(1)) == 1
+
+    def column(self, name):
+        return [self.value(i, name) for i in range(len(self))]
+
+    def to_frame(self):
+        import pandas as pd
+
+        return pd.DataFrame(list(self))
+
+
+def _save_corpus(folder, plants, source_hash, name=BUNDLE_NAME,
+                 extra_arrays=None, extra_meta=None):
+    arrays, columns = compile_columns(plants)
+    arrays.update(extra_arrays or {})
+    meta = {
+        "version": source_hash[:16],
+        "format": CORPUS_VERSION,
+        "source_hash": source_hash,
+        "rows": len(plants),
+        "columns": columns,
+        **(extra_meta or {}),
+    }
+    return save_bundle(folder, name, arrays, meta)
+
+
+def compile_corpus(json_path, folder, source_hash=None):
+    source_hash = source_hash or file_hash(json_path)
+    with open(json_path, "r", encoding="utf-8") as f:
+        plants = json.load(f)
+    return _save_corpus(folder, plants, source_hash)
+
+
+def load_corpus(json_path, folder):
+    """Open the compiled corpus for `json_path`, compiling it first if stale."""
+    source_hash = file_hash(json_path)
+
+    if bundle_path(folder, BUNDLE_NAME):
+        arrays, meta = load_bundle(folder, BUNDLE_NAME)
+        if meta.get("format") == CORPUS_VERSION and meta.get("source_hash") == source_hash:
+            return Corpus(arrays, meta)
+
+    compile_corpus(json_path, folder, source_hash)
+    return Corpus(*load_bundle(folder, BUNDLE_NAME))
+
+
+def publish_corpus(folder, plants, embeddings, corpus_version, model_name):
+    """Publish the corpus columns plus the embedding matrix for workers."""
+    return _save_corpus(
+        folder, plants, corpus_version, name=PUBLISHED_NAME,
+        extra_arrays={"embeddings": embeddings},
+        extra_meta={"corpus_version": corpus_version, "model": model_name},
+    )
+
+
+def attach_corpus(folder):
+    """(corpus, embeddings, meta) from a published bundle."""
+    arrays, meta = load_bundle(folder, PUBLISHED_NAME)
+    return Corpus(arrays, meta), arrays["embeddings"], meta
+
+
+def _rss_mb():
+    import psutil
+
+    return psutil.Process().memory_info().rss / 1e6
+
+
+def main():
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(description="Compile or benchmark the columnar corpus")
+    parser.add_argument("command", choices=["compile", "bench"])
+    parser.add_argument("json_path")
+    parser.add_argument("--folder", default="data/compiled")
+    args = parser.parse_args()
+
+    if args.command == "compile":
+        print(f"Compiled corpus to {compile_corpus(args.json_path, args.folder)}")
+        return
+
+    load_corpus(args.json_path, args.folder)
+
+    rss = _rss_mb()
+    start = time.perf_counter()
+    corpus = load_corpus(args.json_path, args.folder)
+    states = corpus.states
+    col_s = time.perf_counter() - start
+    col_mb = _rss_mb() - rss
+
+    rss = _rss_mb()
+    start = time.perf_counter()
+    with open(args.json_path, "r", encoding="utf-8") as f:
+        df = pd.DataFrame(json.load(f))
+    json_s = time.perf_counter() - start
+    json_mb = _rss_mb() - rss
+
+    same = all(corpus[i] == rec for i, rec in enumerate(df.to_dict("records")))
+    print(f"json + DataFrame  {json_s * 1000:8.1f} ms  rss +{json_mb:6.1f} MB")
+    print(f"columnar (mmap)   {col_s * 1000:8.1f} ms  rss +{col_mb:6.1f} MB  ({len(states)} states)")
+    print(f"records identical: {same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+On-disk embedding store for the retriever.
+
+Each model gets its own folder under STORE_DIR:
+
+    embeddings.npy   float32 matrix (one L2-normalised row per plant)
+    meta.json        store version, model name, dataset hash,
+                     row -> plant id and row -> source text hash
+
+The matrix is opened memory-mapped, so every worker process shares the
+same page cache instead of holding its own copy. When the dataset
+changes only the rows whose source text changed are re-encoded.
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+STORE_VERSION = 1
+STORE_DIR = Path("data/embeddings")
+
+
+def plant_text(p):
+    """Text that gets embedded for one plant record."""
+    return f"{p['plant_name']} {p.get('common_name','')} {p.get('medicinal_uses','')}"
+
+
+def text_hash(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def file_hash(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def store_dir(model_name):
+    return STORE_DIR / model_name.replace("/", "__")
+
+
+def _read_meta(folder):
+    try:
+        with open(folder / "meta.json", "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_atomic(path, write):
+    # Several workers may start at once; each writes its own temp file
+    # and the last rename wins with identical content.
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "wb") as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def load_embeddings(plants, model, model_name, dataset_hash):
+    """
+    Return (embeddings, meta) for `plants`, re-using the on-disk store
+    when it matches `model_name` and `dataset_hash`.
+
+    `embeddings` is a read-only memory-mapped float32 array.
+    """
+    folder = store_dir(model_name)
+    emb_path = folder / "embeddings.npy"
+    meta = _read_meta(folder)
+
+    usable = (
+        meta is not None
+        and meta.get("version") == STORE_VERSION
+        and meta.get("model") == model_name
+        and emb_path.exists()
+    )
+
+    if usable and meta.get("dataset_hash") == dataset_hash:
+        return np.load(emb_path, mmap_mode="r"), meta
+
+    texts = [plant_text(p) for p in plants]
+    hashes = [text_hash(t) for t in texts]
+
+    # Re-use rows from the previous build whose text did not change
+    old_rows = {}
+    old = None
+    if usable:
+        old = np.load(emb_path, mmap_mode="r")
+        old_rows = {h: i for i, h in enumerate(meta["text_hashes"])}
+
+    missing = [i for i, h in enumerate(hashes) if h not in old_rows]
+
+    dim = model.get_sentence_embedding_dimension()
+    matrix = np.empty((len(texts), dim), dtype=np.float32)
+
+    for i, h in enumerate(hashes):
+        if h in old_rows:
+            matrix[i] = old[old_rows[h]]
+
+    if missing:
+        fresh = model.encode(
+            [texts[i] for i in missing],
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+        )
+        matrix[missing] = fresh.astype(np.float32)
+
+    del old
+
+    meta = {
+        "version": STORE_VERSION,
+        "model": model_name,
+        "dataset_hash": dataset_hash,
+        "dim": dim,
+        "plant_ids": [p["plant_name"] for p in plants],
+        "text_hashes": hashes,
+        "reencoded_rows": len(missing),
+    }
+
+    folder.mkdir(parents=True, exist_ok=True)
+    _write_atomic(emb_path, lambda f: np.save(f, matrix))
+    _write_atomic(
+        folder / "meta.json",
+        lambda f: f.write(json.dumps(meta).encode("utf-8")),
+    )
+
+    return np.load(emb_path, mmap_mode="r"), meta
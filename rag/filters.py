@@ -0,0 +1,69 @@
+"""
+Precomputed row masks for the retriever filters.
+
+Instead of walking the ranked list and discarding plants that fail the
+state / native filters, the retriever builds boolean masks once per
+corpus (state -> rows, origin_type -> rows) and only scores the rows
+that pass.
+"""
+import numpy as np
+
+
+def build_filter_index(plants):
+    columns = getattr(plants, "columns", {})
+    if (
+        columns.get("origin_type", {}).get("kind") == "category"
+        and columns.get("suitable_states", {}).get("kind") == "states"
+    ):
+        return _build_from_columns(plants)
+
+    n = len(plants)
+    by_state = {}
+    by_origin = {}
+
+    for i, p in enumerate(plants):
+        origin = p.get("origin_type")
+        if origin not in by_origin:
+            by_origin[origin] = np.zeros(n, dtype=bool)
+        by_origin[origin][i] = True
+
+        for s in p.get("suitable_states") or []:
+            if s not in by_state:
+                by_state[s] = np.zeros(n, dtype=bool)
+            by_state[s][i] = True
+
+    return {"n": n, "state": by_state, "origin": by_origin, "combined": {}}
+
+
+def _build_from_columns(corpus):
+    """Masks straight from the columnar corpus codes / state bitmask."""
+    codes, categories = corpus.codes("origin_type")
+    by_origin = {c: np.asarray(codes == i) for i, c in enumerate(categories)}
+    by_state = {s: corpus.state_mask(s) for s in corpus.states}
+    return {"n": len(corpus), "state": by_state, "origin": by_origin, "combined": {}}
+
+
+def filter_mask(findex, state=None, native_only=True):
+    """
+    Boolean mask of rows passing the filters, or None when nothing is
+    filtered. Combined masks are memoised per (state, native_only).
+    """
+    if not state and not native_only:
+        return None
+
+    key = (state or None, bool(native_only))
+    mask = findex["combined"].get(key)
+    if mask is not None:
+        return mask
+
+    n = findex["n"]
+    mask = np.ones(n, dtype=bool)
+
+    if native_only:
+        mask &= findex["origin"].get("native", np.zeros(n, dtype=bool))
+
+    if state:
+        mask &= findex["state"].get(state, np.zeros(n, dtype=bool))
+
+    findex["combined"][key] = mask
+    return mask
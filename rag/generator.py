@@ -20,33 +20,120 @@
 
 #     except Exception as e:
 #         return f"❌ Exception while calling Ollama: {e}"
-import subprocess
+"""
+Answer generation. generate_answer() is the template answer used by
+app.py by default; stream_generate() streams tokens from a local Ollama
+server over HTTP (/api/generate with stream=true).
+
+One requests.Session is kept for the process, so the connection to the
+model server stays open between questions. Tokens are yielded as they
+arrive. Setting the `cancel` event, or closing the generator (Streamlit
+does this when the user reruns the page), drops the connection and
+Ollama stops generating. Time to first token and throughput of recent
+calls are kept for generation_stats(). A stub server and a TTFT
+benchmark live in rag/generator_bench.py.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+import requests
 
 MODEL_NAME = "phi3:mini"   # 🔴 change only this if needed
+OLLAMA_URL = os.environ.get("OLLAMA_HOST", "http://127.0.0.1:11434")
+CONNECT_TIMEOUT = 5     # seconds
+READ_TIMEOUT = 60       # seconds allowed between two chunks
+METRICS_WINDOW = 200    # calls kept for generation_stats()
+
+_session = requests.Session()
+_metrics = deque(maxlen=METRICS_WINDOW)
+_metrics_lock = threading.Lock()
+
+
+def stream_generate(prompt, model=None, cancel=None, stats=None, url=None, timeout=None, session=None):
+    """
+    Yield the answer to `prompt` token by token. Errors are yielded as a
+    message, like the old subprocess path returned them. `stats`, if
+    given, is a dict filled with ttft / total seconds, tokens, cancelled
+    and error. `timeout` overrides READ_TIMEOUT; `session` overrides the
+    process-wide requests.Session.
+    """
+    stats = {} if stats is None else stats
+    stats.update(model=model or MODEL_NAME, ttft=None, total=None, tokens=0, cancelled=False, error=None)
+    start = time.perf_counter()
+
+    try:
+        with (session or _session).post(
+            f"{url or OLLAMA_URL}/api/generate",
+            json={"model": model or MODEL_NAME, "prompt": prompt, "stream": True},
+            stream=True,
+            timeout=(CONNECT_TIMEOUT, timeout or READ_TIMEOUT),
+        ) as r:
+            r.raise_for_status()
+            for line in r.iter_lines():
+                if cancel is not None and cancel.is_set():
+                    stats["cancelled"] = True
+                    break
+                if not line:
+                    continue
+
+                chunk = json.loads(line)
+                if chunk.get("error"):
+                    raise ValueError(chunk["error"])
+
+                token = chunk.get("response", "")
+                if token:
+                    if stats["ttft"] is None:
+                        stats["ttft"] = time.perf_counter() - start
+                    stats["tokens"] += 1
+                    yield token
+
+                if chunk.get("done"):
+                    break
+
+        if not stats["tokens"] and not stats["cancelled"]:
+            yield "⚠️ Model returned empty output."
+
+    except GeneratorExit:
+        stats["cancelled"] = True
+        raise
+    except requests.Timeout:
+        stats["error"] = "timeout"
+        yield "⚠️ Model took too long to respond. Try a shorter question."
+    except (requests.RequestException, ValueError) as e:
+        stats["error"] = str(e)
+        yield f"❌ Ollama error:\n{e}"
+    finally:
+        stats["total"] = time.perf_counter() - start
+        with _metrics_lock:
+            _metrics.append(dict(stats))
+
+
+def generate(prompt, model=None):
+    """Whole answer at once (joins stream_generate)."""
+    return "".join(stream_generate(prompt, model)).strip()
+
+
+def generation_stats():
+    """Time to first token and throughput over the last METRICS_WINDOW calls."""
+    with _metrics_lock:
+        calls = list(_metrics)
+
+    ttft = np.array([c["ttft"] for c in calls if c["ttft"] is not None])
+    rates = [c["tokens"] / c["total"] for c in calls if c["tokens"] and c["total"]]
+    return {
+        "calls": len(calls),
+        "ttft_p50": float(np.percentile(ttft, 50)) if len(ttft) else None,
+        "ttft_p95": float(np.percentile(ttft, 95)) if len(ttft) else None,
+        "tokens_per_s": float(np.mean(rates)) if rates else None,
+        "cancelled": sum(c["cancelled"] for c in calls),
+        "errors": sum(c["error"] is not None for c in calls),
+    }
 
-# def generate(prompt):
-#     try:
-#         result = subprocess.run(
-#             ["ollama", "run", MODEL_NAME],
-#             input=prompt,
-#             text=True,
-#             capture_output=True,
-#             timeout=60   # 🔴 reduce timeout
-#         )
-
-#         if result.returncode != 0:
-#             return f"❌ Ollama error:\n{result.stderr}"
-
-#         if not result.stdout.strip():
-#             return "⚠️ Model returned empty output."
-
-#         return result.stdout.strip()
 
-#     except subprocess.TimeoutExpired:
-#         return "⚠️ Model took too long to respond. Try a shorter question."
-
-#     except Exception as e:
-#         return f"❌ Exception while calling Ollama: {e}"
 def generate_answer(query, plants):
     lines = []
 
@@ -66,4 +153,3 @@ def generate_answer(query, plants):
         lines.append("")  # spacing
 
     return "\n".join(lines)
-
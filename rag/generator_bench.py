@@ -0,0 +1,97 @@
+"""
+Stub model server and TTFT benchmark for rag/generator.py (dev tool).
+
+The stub answers /api/generate with canned tokens, chunked like Ollama,
+so streaming, cancellation and the LLM pool can be tried without a
+model. The benchmark measures time to first token and cancellation.
+
+    python -m rag.generator_bench stub --port 11435      # canned-token server
+    python -m rag.generator_bench bench --url http://127.0.0.1:11435
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from rag.generator import MODEL_NAME, OLLAMA_URL, generation_stats, stream_generate
+
+STUB_TOKENS = [
+    "Tulsi", " (Ocimum", " tenuiflorum)", " is", " a", " native", " plant",
+    " traditionally", " used", " for", " cough", ".",
+]
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """Answers /api/generate with canned tokens, chunked, like Ollama."""
+    protocol_version = "HTTP/1.1"
+    delay = 0.05
+    first_delay = 0.2
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        chunks = [{"model": body.get("model"), "response": t, "done": False} for t in STUB_TOKENS]
+        chunks.append({"model": body.get("model"), "response": "", "done": True, "eval_count": len(STUB_TOKENS)})
+        try:
+            for n, chunk in enumerate(chunks):
+                time.sleep(self.first_delay if n == 0 else self.delay)
+                data = (json.dumps(chunk) + "\n").encode("utf-8")
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            self.log_message("client went away after %d chunks", n)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def run_stub(port, delay, first_delay, verbose=False):
+    _StubHandler.delay = delay
+    _StubHandler.first_delay = first_delay
+    server = ThreadingHTTPServer(("127.0.0.1", port), _StubHandler)
+    server.verbose = verbose
+    print(f"stub model server on http://127.0.0.1:{port}")
+    server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Streaming generator: stub server and TTFT benchmark")
+    parser.add_argument("command", choices=["stub", "bench"])
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--delay", type=float, default=0.05, help="stub: seconds between tokens")
+    parser.add_argument("--first-delay", type=float, default=0.2, help="stub: seconds before the first token")
+    parser.add_argument("--url", default=OLLAMA_URL)
+    parser.add_argument("--model", default=MODEL_NAME)
+    parser.add_argument("-n", type=int, default=5, help="bench: number of questions")
+    args = parser.parse_args()
+
+    if args.command == "stub":
+        run_stub(args.port, args.delay, args.first_delay, verbose=True)
+        return
+
+    prompt = "Which native medicinal plants are good for cough in Kerala?"
+    for _ in range(args.n):
+        stats = {}
+        text = "".join(stream_generate(prompt, args.model, stats=stats, url=args.url))
+        ttft = f"{stats['ttft']:.3f} s" if stats["ttft"] is not None else "-"
+        print(f"ttft {ttft}  total {stats['total']:.3f} s  {stats['tokens']} tokens  {text[:40]!r}")
+
+    # Cancel after the third token; the connection is dropped
+    cancel = threading.Event()
+    stats = {}
+    for n, _ in enumerate(stream_generate(prompt, args.model, cancel=cancel, stats=stats, url=args.url)):
+        if n == 2:
+            cancel.set()
+    print(f"cancelled after {stats['tokens']} tokens in {stats['total']:.3f} s")
+    print(generation_stats())
+
+
+if __name__ == "__main__":
+    main()
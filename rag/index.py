@@ -0,0 +1,340 @@
+"""
+Vector index backends behind retrieve().
+
+    exact   brute-force inner product over the embedding matrix
+    ivf     faiss IndexIVFFlat (inner product)
+    hnsw    faiss IndexHNSWFlat (inner product)
+
+All backends take L2-normalised float32 rows, so the inner product is
+the cosine score. ANN indexes are built offline and saved next to the
+embedding store:
+
+    python -m rag.index build --mode hnsw
+    python -m rag.index eval --k 5
+"""
+import argparse
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+
+INDEX_MODES = ("exact", "ivf", "hnsw")
+
+# Lists scanned per IVF query. nlist is ~sqrt(n) (43 for this corpus);
+# on held-out rows recall@5 was 0.92 at 8 and 0.97 at 16, still at half
+# the exact latency (python -m rag.index eval)
+IVF_NPROBE = 16
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 64
+
+
+# Filters that keep fewer rows than this fraction of the corpus are
+# answered by exact scoring over the surviving rows; graph/list search
+# with a very selective filter loses recall and is no faster.
+EXACT_FILTER_FRACTION = 0.1
+
+
+def _top_k(scores, k):
+    k = min(k, len(scores))
+    if k == 0:
+        return scores[:0], np.arange(0)
+
+    if k < len(scores):
+        ids = np.argpartition(-scores, k - 1)[:k]
+    else:
+        ids = np.arange(len(scores))
+
+    ids = ids[np.argsort(-scores[ids], kind="stable")]
+    return scores[ids], ids
+
+
+class ExactIndex:
+    mode = "exact"
+
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+
+    @property
+    def ntotal(self):
+        return self.embeddings.shape[0]
+
+    def search(self, query, k, mask=None):
+        """
+        Return (scores, ids) of the k best rows, best first. With a
+        boolean `mask` only the rows that pass it are scored.
+        """
+        if mask is None:
+            return _top_k(self.embeddings @ query, k)
+
+        rows = np.flatnonzero(mask)
+        scores, ids = _top_k(self.embeddings[rows] @ query, k)
+        return scores, rows[ids]
+
+    def search_batch(self, queries, k, masks=None):
+        """
+        Search many queries with one matrix multiply. `masks` is an
+        optional list with a boolean mask (or None) per query. Returns a
+        list of (scores, ids) pairs, as search() would for each query.
+        """
+        scores = np.asarray(queries) @ self.embeddings.T
+
+        if masks is not None and any(m is not None for m in masks):
+            allowed = np.stack([
+                np.ones(self.ntotal, dtype=bool) if m is None else m
+                for m in masks
+            ])
+            scores = np.where(allowed, scores, -np.inf)
+
+        k = min(k, self.ntotal)
+        if k == 0:
+            return [(s[:0], np.arange(0)) for s in scores]
+
+        if k < self.ntotal:
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            top = np.tile(np.arange(self.ntotal), (len(scores), 1))
+
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind="stable")
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+        # Rows removed by a mask score -inf; drop them from the result
+        results = []
+        for s, ids in zip(top_scores, top):
+            keep = np.isfinite(s)
+            results.append((s[keep], ids[keep]))
+        return results
+
+    def save(self, path):
+        # Nothing to save: the embedding store already holds the matrix
+        pass
+
+
+class FaissIndex:
+    def __init__(self, mode, index, embeddings):
+        self.mode = mode
+        self.index = index
+        self.exact = ExactIndex(embeddings)
+
+    @property
+    def ntotal(self):
+        return self.index.ntotal
+
+    def search(self, query, k, mask=None):
+        import faiss
+
+        k = min(k, self.ntotal)
+        params = None
+
+        if mask is not None:
+            if mask.sum() < EXACT_FILTER_FRACTION * self.ntotal:
+                return self.exact.search(query, k, mask)
+
+            sel = faiss.IDSelectorBatch(np.flatnonzero(mask).astype("int64"))
+            if self.mode == "ivf":
+                params = faiss.SearchParametersIVF(sel=sel, nprobe=self.index.nprobe)
+            else:
+                params = faiss.SearchParametersHNSW(sel=sel, efSearch=self.index.hnsw.efSearch)
+
+        scores, ids = self.index.search(
+            np.asarray(query, dtype=np.float32).reshape(1, -1), k, params=params
+        )
+        keep = ids[0] >= 0
+        return scores[0][keep], ids[0][keep]
+
+    def search_batch(self, queries, k, masks=None):
+        if masks is None:
+            masks = [None] * len(queries)
+
+        # Unfiltered queries go to faiss in a single call; filtered ones
+        # need their own selector.
+        results = [None] * len(queries)
+        plain = [i for i, m in enumerate(masks) if m is None]
+
+        if plain:
+            kk = min(k, self.ntotal)
+            scores, ids = self.index.search(
+                np.asarray(queries, dtype=np.float32)[plain], kk
+            )
+            for row, i in enumerate(plain):
+                keep = ids[row] >= 0
+                results[i] = (scores[row][keep], ids[row][keep])
+
+        for i, m in enumerate(masks):
+            if m is not None:
+                results[i] = self.search(queries[i], k, m)
+
+        return results
+
+    def save(self, path):
+        import faiss
+
+        faiss.write_index(self.index, str(path))
+
+
+def build_index(mode, embeddings):
+    if mode == "exact":
+        return ExactIndex(embeddings)
+
+    import faiss
+
+    xb = np.ascontiguousarray(embeddings, dtype=np.float32)
+    n, dim = xb.shape
+
+    if mode == "ivf":
+        # faiss wants ~39 training points per list
+        nlist = max(1, min(int(np.sqrt(n)), n // 39))
+        quantizer = faiss.IndexFlatIP(dim)
+        index = faiss.IndexIVFFlat(quantizer, dim, nlist, faiss.METRIC_INNER_PRODUCT)
+        index.train(xb)
+        index.add(xb)
+        index.nprobe = min(IVF_NPROBE, nlist)
+        return FaissIndex(mode, index, embeddings)
+
+    if mode == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        index.add(xb)
+        index.hnsw.efSearch = HNSW_EF_SEARCH
+        return FaissIndex(mode, index, embeddings)
+
+    raise ValueError(f"Unknown index mode: {mode!r} (expected one of {INDEX_MODES})")
+
+
+def index_path(folder, mode):
+    return Path(folder) / f"index_{mode}.faiss"
+
+
+def save_index(index, folder, dataset_hash):
+    folder = Path(folder)
+    folder.mkdir(parents=True, exist_ok=True)
+    index.save(index_path(folder, index.mode))
+    with open(folder / f"index_{index.mode}.json", "w", encoding="utf-8") as f:
+        json.dump({"mode": index.mode, "dataset_hash": dataset_hash}, f)
+
+
+def load_index(mode, folder, embeddings, dataset_hash, storage="float32"):
+    """
+    Load a saved index for `mode`, or build (and save) one when it is
+    missing or was built from a different dataset.
+
+    `storage` ("float32", "float16" or "int8") only applies to the exact
+    mode; see rag/quantize.py.
+    """
+    if mode == "exact":
+        if storage != "float32":
+            from rag.quantize import QuantizedIndex
+
+            return QuantizedIndex(embeddings, storage)
+        return ExactIndex(embeddings)
+
+    import faiss
+
+    folder = Path(folder)
+    try:
+        with open(folder / f"index_{mode}.json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        meta = None
+
+    if meta and meta.get("dataset_hash") == dataset_hash and index_path(folder, mode).exists():
+        index = faiss.read_index(str(index_path(folder, mode)))
+        # Saved indexes keep the nprobe they were built with
+        if mode == "ivf":
+            index.nprobe = min(IVF_NPROBE, index.nlist)
+        return FaissIndex(mode, index, embeddings)
+
+    index = build_index(mode, embeddings)
+    save_index(index, folder, dataset_hash)
+    return index
+
+
+def evaluate(embeddings, queries, k=5, modes=INDEX_MODES, nprobes=(IVF_NPROBE,)):
+    """
+    Measure recall@k against the exact index and mean latency per query.
+    The IVF index is measured once per value in `nprobes`.
+
+    Returns {label: {"recall": float, "latency_ms": float}}.
+    """
+    exact = ExactIndex(embeddings)
+    truth = [set(exact.search(q, k)[1].tolist()) for q in queries]
+
+    report = {}
+    for mode in modes:
+        index = build_index(mode, embeddings)
+
+        settings = [(mode, None)]
+        if mode == "ivf":
+            nlist = index.index.nlist
+            settings = [(f"ivf nprobe={min(p, nlist)}/{nlist}", min(p, nlist)) for p in nprobes]
+
+        for label, nprobe in settings:
+            if nprobe is not None:
+                index.index.nprobe = nprobe
+
+            hits = 0
+            start = time.perf_counter()
+            for q, expected in zip(queries, truth):
+                _, ids = index.search(q, k)
+                hits += len(expected & set(ids.tolist()))
+            elapsed = time.perf_counter() - start
+
+            report[label] = {
+                "recall": hits / (k * len(queries)),
+                "latency_ms": 1000 * elapsed / len(queries),
+            }
+
+    return report
+
+
+def main():
+    from rag import retriever
+    from rag.embedding_store import store_dir
+
+    parser = argparse.ArgumentParser(description="Build or evaluate retriever indexes")
+    parser.add_argument("command", choices=["build", "eval"])
+    parser.add_argument("--mode", choices=INDEX_MODES, default="hnsw")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=200,
+                        help="corpus rows held out of the index and used as eval queries")
+    parser.add_argument("--query-file",
+                        help="text file with one question per line, encoded with the retriever's "
+                             "model, instead of held-out rows")
+    parser.add_argument("--nprobe", default="1,2,4,8,16", help="IVF nprobe values to compare")
+    args = parser.parse_args()
+
+    retriever.load_data()
+    embeddings = retriever._embeddings
+    folder = store_dir(retriever.MODEL_NAME)
+
+    if args.command == "build":
+        index = build_index(args.mode, embeddings)
+        save_index(index, folder, retriever._corpus_version)
+        print(f"Saved {args.mode} index ({index.ntotal} rows) to {folder}")
+        return
+
+    if args.query_file:
+        with open(args.query_file, "r", encoding="utf-8") as f:
+            queries = retriever._encode_queries([line.strip() for line in f if line.strip()])
+        base = np.asarray(embeddings)
+        source = args.query_file
+    else:
+        # A row that is also in the index is its own nearest neighbour,
+        # which inflates recall: index the other rows only
+        rng = np.random.default_rng(0)
+        held = np.zeros(len(embeddings), dtype=bool)
+        held[rng.choice(len(embeddings), size=min(args.queries, len(embeddings) // 2), replace=False)] = True
+        queries, base = np.asarray(embeddings[held]), np.asarray(embeddings[~held])
+        source = "held-out rows"
+
+    nprobes = [int(p) for p in args.nprobe.split(",")]
+    print(f"recall@{args.k} vs exact, {len(queries)} queries ({source}), {len(base)} indexed rows")
+    for label, r in evaluate(base, queries, k=args.k, nprobes=nprobes).items():
+        print(f"  {label:<20} recall={r['recall']:.3f}  latency={r['latency_ms']:.3f} ms/query")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+BM25 inverted index over plant names, common names, uses and
+knowledge text, plus an exact-name lookup table.
+
+Postings hold precomputed BM25 impact weights, so scoring a query is a
+few numpy scatter-adds. The index is built once per dataset hash and
+pickled next to the embedding store.
+"""
+import pickle
+import re
+from collections import Counter, defaultdict
+from pathlib import Path
+
+import numpy as np
+
+from rag.index import _top_k
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Name tokens are counted this many times so they outweigh long texts
+NAME_BOOST = 3
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_AUTHOR_RE = re.compile(r"\(.*?\)")
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall(str(text).lower())
+
+
+def normalize_name(text):
+    return " ".join(tokenize(text))
+
+
+def name_keys(plant):
+    """All exact-match keys for a plant: full name, binomial, common names."""
+    keys = set()
+    name = plant.get("plant_name") or ""
+
+    keys.add(normalize_name(name))
+    binomial = _AUTHOR_RE.sub(" ", name).split()[:2]
+    if len(binomial) == 2:
+        keys.add(normalize_name(" ".join(binomial)))
+
+    for common in re.split(r"[,;/]", plant.get("common_name") or ""):
+        keys.add(normalize_name(common))
+
+    keys.discard("")
+    return keys
+
+
+def _doc_tokens(plant):
+    uses = plant.get("medicinal_uses") or []
+    if isinstance(uses, list):
+        uses = " ".join(map(str, uses))
+
+    names = tokenize(plant.get("plant_name", "")) + tokenize(plant.get("common_name", ""))
+    return (
+        names * NAME_BOOST
+        + tokenize(uses)
+        + tokenize(plant.get("knowledge_text", ""))
+    )
+
+
+def build_lexical_index(plants):
+    n = len(plants)
+    doc_len = np.zeros(n, dtype=np.float32)
+    raw = defaultdict(list)
+    names = defaultdict(list)
+
+    for i, p in enumerate(plants):
+        tokens = _doc_tokens(p)
+        doc_len[i] = len(tokens)
+        for term, tf in Counter(tokens).items():
+            raw[term].append((i, tf))
+        for key in name_keys(p):
+            names[key].append(i)
+
+    avgdl = float(doc_len.mean()) if n else 0.0
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * doc_len / max(avgdl, 1e-9))
+
+    postings = {}
+    for term, entries in raw.items():
+        rows = np.fromiter((r for r, _ in entries), dtype=np.int32, count=len(entries))
+        tf = np.fromiter((t for _, t in entries), dtype=np.float32, count=len(entries))
+        df = len(entries)
+        idf = np.log(1 + (n - df + 0.5) / (df + 0.5))
+        postings[term] = (rows, (idf * tf * (BM25_K1 + 1) / (tf + norm[rows])).astype(np.float32))
+
+    return {"n": n, "postings": postings, "names": dict(names)}
+
+
+def save_lexical_index(lex, folder, dataset_hash):
+    folder = Path(folder)
+    folder.mkdir(parents=True, exist_ok=True)
+    with open(folder / "lexical.pkl", "wb") as f:
+        pickle.dump({"dataset_hash": dataset_hash, "index": lex}, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def load_lexical_index(plants, folder, dataset_hash):
+    """Load the pickled index for `dataset_hash`, building it if needed."""
+    try:
+        with open(Path(folder) / "lexical.pkl", "rb") as f:
+            saved = pickle.load(f)
+        if saved.get("dataset_hash") == dataset_hash:
+            return saved["index"]
+    except (OSError, pickle.UnpicklingError, EOFError):
+        pass
+
+    lex = build_lexical_index(plants)
+    save_lexical_index(lex, folder, dataset_hash)
+    return lex
+
+
+def exact_name_rows(lex, query, mask=None):
+    """Rows whose scientific / binomial / common name equals the query."""
+    rows = lex["names"].get(normalize_name(query), [])
+    if mask is not None:
+        rows = [r for r in rows if mask[r]]
+    return rows
+
+
+def bm25_search(lex, query, k, mask=None):
+    """Return (scores, ids) of the k best BM25 rows, best first."""
+    scores = np.zeros(lex["n"], dtype=np.float32)
+    for term in set(tokenize(query)):
+        posting = lex["postings"].get(term)
+        if posting is not None:
+            scores[posting[0]] += posting[1]
+
+    if mask is not None:
+        rows = np.flatnonzero(mask & (scores > 0))
+    else:
+        rows = np.flatnonzero(scores > 0)
+
+    top_scores, ids = _top_k(scores[rows], k)
+    return top_scores, rows[ids]
+
+
+def rrf_fuse(rankings, k, rrf_k=60):
+    """Reciprocal-rank fusion of several ranked id lists."""
+    fused = defaultdict(float)
+    for ranking in rankings:
+        for rank, idx in enumerate(ranking):
+            fused[int(idx)] += 1.0 / (rrf_k + rank + 1)
+    return sorted(fused, key=lambda i: (-fused[i], i))[:k]
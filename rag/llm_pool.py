@@ -0,0 +1,281 @@
+"""
+Fixed pool of long-lived LLM workers in front of the Ollama server.
+
+WORKERS threads each keep their own HTTP connection (requests.Session)
+to the model server (rag/generator.py) and take questions from a
+bounded queue of QUEUE_SIZE. When the queue is full a question is not
+queued at all: it gets the templated generate_answer() straight away.
+Every question has a deadline. If it is still queued at the deadline,
+or the model has not answered by then, the template answer is used too
+(a partial model answer is cut off with a note). A question whose
+reader goes away (e.g. a Streamlit rerun) is stopped and counted as
+cancelled.
+
+Queue depth (seen by each new question) and queue wait times are kept
+as histograms for stats(). Ollama runs OLLAMA_NUM_PARALLEL requests at
+once, so WORKERS should match that setting.
+
+    python -m rag.llm_pool --url http://127.0.0.1:11435 -n 40
+"""
+import argparse
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from rag.generator import generate_answer, stream_generate
+from rag.prompt_builder import CONTEXT_TOKENS, build_context, build_prompt
+
+WORKERS = int(os.environ.get("PLANTMATCH_LLM_WORKERS", "2"))
+QUEUE_SIZE = int(os.environ.get("PLANTMATCH_LLM_QUEUE", "8"))
+DEADLINE = float(os.environ.get("PLANTMATCH_LLM_DEADLINE", "60"))    # seconds per question
+
+WAIT_BUCKETS = [0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60]    # seconds
+
+_DONE = object()
+
+
+class Histogram:
+    """Counts per bucket; bucket i holds values <= bounds[i] (the last is overflow)."""
+
+    def __init__(self, bounds):
+        self.bounds = list(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        i = 0
+        while i < len(self.bounds) and value > self.bounds[i]:
+            i += 1
+        self.counts[i] += 1
+        self.total += 1
+        self.sum += value
+
+    def snapshot(self):
+        labels = [f"<={b:g}" for b in self.bounds] + [f">{self.bounds[-1]:g}"]
+        return {
+            "buckets": dict(zip(labels, self.counts)),
+            "count": self.total,
+            "mean": self.sum / self.total if self.total else 0.0,
+        }
+
+
+class Job:
+    """
+    One question. Iterating it yields the answer tokens; `source` ends
+    up "model", "partial", "template" or "cancelled".
+    """
+
+    def __init__(self, query, plants, prompt, deadline):
+        self.query = query
+        self.plants = plants
+        self.prompt = prompt
+        self.deadline = time.monotonic() + deadline
+        self.enqueued = time.monotonic()
+        self.tokens = queue.Queue()
+        self.started = threading.Event()
+        self.cancel = threading.Event()
+        self.source = None
+        self.reason = None
+        self.stats = {}
+
+    def time_left(self):
+        return max(self.deadline - time.monotonic(), 0.0)
+
+    def fallback(self, reason):
+        self.source = "template"
+        self.reason = reason
+        self.tokens.put(generate_answer(self.query, self.plants))
+        self.tokens.put(_DONE)
+
+    def __iter__(self):
+        try:
+            while True:
+                try:
+                    # Only a job still waiting in the queue can time out here;
+                    # once a worker has it, the worker enforces the deadline
+                    timeout = None if self.started.is_set() else self.time_left()
+                    token = self.tokens.get(timeout=timeout)
+                except queue.Empty:
+                    if self.started.is_set():
+                        continue
+                    self.cancel.set()
+                    self.source, self.reason = "template", "deadline in queue"
+                    yield generate_answer(self.query, self.plants)
+                    return
+                if token is _DONE:
+                    return
+                yield token
+        finally:
+            # Also stops the worker when the reader goes away early
+            self.cancel.set()
+
+    def text(self):
+        return "".join(self)
+
+
+class LLMPool:
+    def __init__(self, workers=WORKERS, queue_size=QUEUE_SIZE, deadline=DEADLINE, model=None, url=None):
+        self.deadline = deadline
+        self.model = model
+        self.url = url
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.lock = threading.Lock()
+        self.depth_hist = Histogram(range(queue_size + 1))
+        self.wait_hist = Histogram(WAIT_BUCKETS)
+        self.counts = {"submitted": 0, "rejected": 0, "expired": 0, "model": 0, "partial": 0,
+                       "template": 0, "cancelled": 0, "errors": 0}
+
+        self.threads = [
+            threading.Thread(target=self._worker, name=f"llm-worker-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for t in self.threads:
+            t.start()
+
+    def _count(self, key):
+        with self.lock:
+            self.counts[key] += 1
+
+    def submit(self, query, plants, prompt=None, deadline=None):
+        """Queue a question; when the queue is full the Job already holds the template answer."""
+        if prompt is None:
+            prompt = build_prompt(query, build_context(plants, max_tokens=CONTEXT_TOKENS))
+        job = Job(query, plants, prompt, deadline or self.deadline)
+
+        with self.lock:
+            self.counts["submitted"] += 1
+            self.depth_hist.observe(self.queue.qsize())
+        try:
+            self.queue.put_nowait(job)
+        except queue.Full:
+            self._count("rejected")
+            self._count("template")
+            job.fallback("queue full")
+        return job
+
+    def _worker(self):
+        # One connection per worker, kept open between questions
+        session = requests.Session()
+        while True:
+            job = self.queue.get()
+            if job is None:
+                session.close()
+                return
+
+            with self.lock:
+                self.wait_hist.observe(time.monotonic() - job.enqueued)
+            if job.cancel.is_set() and job.source is None:
+                # Reader went away while the job was queued
+                self._count("cancelled")
+                job.source, job.reason = "cancelled", "reader went away"
+                job.tokens.put(_DONE)
+                continue
+            if job.cancel.is_set() or not job.time_left():
+                self._count("expired")
+                self._count("template")
+                job.fallback("deadline in queue")
+                continue
+
+            job.started.set()
+            self._run(job, session)
+
+    def _run(self, job, session=None):
+        tokens = stream_generate(
+            job.prompt, self.model, cancel=job.cancel, stats=job.stats,
+            url=self.url, timeout=job.time_left(), session=session,
+        )
+        sent = 0
+        for token in tokens:
+            if job.stats.get("error"):
+                break
+            job.tokens.put(token)
+            sent += 1
+            if not job.time_left():
+                job.cancel.set()
+        tokens.close()
+
+        error = job.stats.get("error")
+        if error:
+            self._count("errors")
+
+        if job.stats.get("cancelled") and job.time_left():
+            # Stopped by the reader, not by the deadline: not a model answer
+            self._count("cancelled")
+            job.source, job.reason = "cancelled", "reader went away"
+            job.tokens.put(_DONE)
+            return
+
+        if not sent:
+            self._count("template")
+            job.fallback(error or "deadline")
+            return
+
+        if error or not job.time_left():
+            job.source, job.reason = "partial", error or "deadline"
+            job.tokens.put("\n\n⚠️ Answer cut short (time limit reached).")
+        else:
+            job.source = "model"
+        self._count(job.source)
+        job.tokens.put(_DONE)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "workers": len(self.threads),
+                "queue_size": self.queue.maxsize,
+                "queued": self.queue.qsize(),
+                **self.counts,
+                "queue_depth": self.depth_hist.snapshot(),
+                "queue_wait_s": self.wait_hist.snapshot(),
+            }
+
+    def close(self):
+        for _ in self.threads:
+            self.queue.put(None)
+        for t in self.threads:
+            t.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the LLM pool (e.g. against rag.generator_bench stub)")
+    parser.add_argument("--url", default=None)
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--queue-size", type=int, default=QUEUE_SIZE)
+    parser.add_argument("--deadline", type=float, default=DEADLINE)
+    parser.add_argument("-n", type=int, default=40, help="simultaneous questions")
+    args = parser.parse_args()
+
+    pool = LLMPool(args.workers, args.queue_size, args.deadline, url=args.url)
+    plants = [{"plant_name": "Ocimum tenuiflorum L.", "origin_type": "native"}]
+
+    def ask(i):
+        start = time.perf_counter()
+        job = pool.submit(f"Question {i}: which plants help with cough?", plants)
+        job.text()
+        return job.source, time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.n) as ex:
+        results = list(ex.map(ask, range(args.n)))
+    elapsed = time.perf_counter() - start
+
+    for source in ("model", "partial", "template"):
+        times = [t for s, t in results if s == source]
+        if times:
+            print(f"{source:9s} {len(times):4d}  max latency {max(times):.2f} s")
+    print(f"{args.n} questions in {elapsed:.2f} s")
+    stats = pool.stats()
+    for key in ("submitted", "rejected", "expired", "errors"):
+        print(f"  {key}: {stats[key]}")
+    print(f"  queue depth  {stats['queue_depth']['buckets']}")
+    print(f"  queue wait s {stats['queue_wait_s']['buckets']}")
+    pool.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,147 @@
-def build_context(plants, max_chars=750):
+"""
+Prompt assembly for the LLM path.
+
+build_context() has two modes. Without `max_tokens` it is the original
+character cut at `max_chars`. With `max_tokens` it packs whole field
+lines into a token budget, counted with the generator's tokenizer:
+
+    1. every plant's name, in retrieval order
+    2. then every plant's uses, then safety notes, then native status
+
+so a lower-priority field of one plant never pushes out a more
+important field of another, and no field is cut mid-way (long fields
+are shortened to FIELD_TOKENS at word boundaries when their snippet is
+built). Snippets and their token counts are made once per plant and
+cached, and warm_snippets() fills the cache when the corpus loads, so
+packing a request is a few additions.
+
+The tokenizer is TOKENIZER_NAME through transformers (phi3:mini's
+tokenizer), loaded from the local Hugging Face cache only, never
+downloaded at startup. When it is not installed or not cached, a
+word/punctuation splitter gives a close estimate; the counter in use is
+logged and kept in `token_counter`.
+
+    python -m rag.prompt_builder bench data/plant_ai_dataset_v2_native_state.json
+"""
+import argparse
+import json
+import logging
+import re
+import time
+
+TOKENIZER_NAME = "microsoft/Phi-3-mini-4k-instruct"
+CONTEXT_TOKENS = 200    # about what max_chars=750 gave
+
+# Field label, record key, token cap; in packing priority order
+FIELDS = [
+    ("Plant", "plant_name", 32),
+    ("Uses", "medicinal_uses", 40),
+    ("Safety", "risk_notes", 24),
+    ("Native", "origin_type", 4),
+]
+
+_PIECE_RE = re.compile(r"\w+|[^\w\s]")
+
+logger = logging.getLogger(__name__)
+
+_tokenizer = None
+_snippets = {}
+token_counter = None    # TOKENIZER_NAME or "word/punctuation estimate", once loaded
+
+
+def _load_tokenizer():
+    global _tokenizer, token_counter
+    if _tokenizer is None:
+        try:
+            from transformers import AutoTokenizer
+
+            hf = AutoTokenizer.from_pretrained(TOKENIZER_NAME, local_files_only=True)
+            _tokenizer = lambda text: len(hf.encode(text, add_special_tokens=False))
+            token_counter = TOKENIZER_NAME
+            logger.info("Counting context tokens with %s", TOKENIZER_NAME)
+        except (OSError, ImportError) as e:
+            _tokenizer = lambda text: len(_PIECE_RE.findall(text))
+            token_counter = "word/punctuation estimate"
+            logger.warning("Tokenizer %s not available (%s); counting context tokens "
+                           "with the word/punctuation estimate", TOKENIZER_NAME, e)
+    return _tokenizer
+
+
+def count_tokens(text):
+    return _load_tokenizer()(text)
+
+
+def _field_text(value):
+    if isinstance(value, list):
+        value = "; ".join(str(v) for v in value)
+    return " ".join(str(value or "").split())
+
+
+def _shorten(text, cap):
+    """Longest run of whole words from the start that fits in `cap` tokens."""
+    if count_tokens(text) <= cap:
+        return text
+    words = text.split()
+    lo, hi = 0, len(words)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if count_tokens(" ".join(words[:mid]) + " …") <= cap:
+            lo = mid
+        else:
+            hi = mid - 1
+    return " ".join(words[:lo]) + " …" if lo else ""
+
+
+def plant_snippets(p):
+    """[(line, tokens)] per field in FIELDS order (None for empty fields); cached."""
+    values = tuple(_field_text(p.get(key)) for _, key, _ in FIELDS)
+    snippets = _snippets.get(values)
+    if snippets is None:
+        snippets = []
+        for (label, _, cap), value in zip(FIELDS, values):
+            value = _shorten(value, cap)
+            if value:
+                line = f"{label}: {value}"
+                # +1 for the newline after the line
+                snippets.append((line, count_tokens(line) + 1))
+            else:
+                snippets.append(None)
+        _snippets[values] = snippets
+    return snippets
+
+
+def warm_snippets(plants):
+    """Build the snippets of every plant up front (at corpus load)."""
+    for p in plants:
+        plant_snippets(p)
+    return len(_snippets)
+
+
+def pack_context(plants, max_tokens=CONTEXT_TOKENS):
+    """(context, tokens used) with whole field lines, by FIELDS priority."""
+    snippets = [plant_snippets(p) for p in plants]
+    chosen = [[] for _ in plants]
+    used = 0
+
+    for f in range(len(FIELDS)):
+        for i, fields in enumerate(snippets):
+            if fields[f] is None or (f and not chosen[i]):
+                continue    # no field, or the plant's name did not fit
+            line, n = fields[f]
+            # A new plant block is separated by one blank line
+            cost = n + (1 if f == 0 and used else 0)
+            if used + cost <= max_tokens:
+                chosen[i].append(line)
+                used += cost
+
+    blocks = ["\n".join(lines) for lines in chosen if lines]
+    return "\n\n".join(blocks), used
+
+
+def build_context(plants, max_chars=750, max_tokens=None):
+    if max_tokens is not None:
+        return pack_context(plants, max_tokens)[0]
+
     blocks = []
 
     for p in plants:
@@ -47,3 +190,45 @@ Question:
 
 Answer:
 """
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare character cut and token packing of the context")
+    parser.add_argument("command", choices=["bench"])
+    parser.add_argument("dataset_path")
+    parser.add_argument("--top-k", type=int, default=4)
+    parser.add_argument("--max-tokens", type=int, default=CONTEXT_TOKENS)
+    args = parser.parse_args()
+
+    with open(args.dataset_path, "r", encoding="utf-8") as f:
+        plants = json.load(f)
+    groups = [plants[i:i + args.top_k] for i in range(0, len(plants) - args.top_k, args.top_k)]
+
+    start = time.perf_counter()
+    warm_snippets(plants)
+    print(f"snippets for {len(plants)} plants in {time.perf_counter() - start:.2f} s "
+          f"(token counter: {token_counter})")
+
+    start = time.perf_counter()
+    chars = [build_context(g) for g in groups]
+    char_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    packed = [pack_context(g, args.max_tokens) for g in groups]
+    pack_s = time.perf_counter() - start
+
+    char_tokens = [count_tokens(c) for c in chars]
+    names = sum(
+        all(p["plant_name"] in c for p in g) for g, (c, _) in zip(groups, packed)
+    )
+    print(f"{len(groups)} contexts of {args.top_k} plants")
+    print(f"  max_chars=750     {1e6 * char_s / len(groups):7.1f} us  "
+          f"{sum(char_tokens) / len(groups):6.1f} tokens avg, max {max(char_tokens)}")
+    print(f"  max_tokens={args.max_tokens:<5d} {1e6 * pack_s / len(groups):7.1f} us  "
+          f"{sum(n for _, n in packed) / len(groups):6.1f} tokens avg, max {max(n for _, n in packed)}")
+    print(f"  all plant names kept: {names}/{len(groups)} packed, "
+          f"{sum(all(p['plant_name'] in c for p in g) for g, c in zip(groups, chars))}/{len(groups)} cut")
+
+
+if __name__ == "__main__":
+    main()
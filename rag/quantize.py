@@ -0,0 +1,162 @@
+"""
+Compact (float16 / int8) first-pass scoring for the exact index.
+
+The quantised matrix is the only copy of the embeddings each worker
+keeps in its own memory. It picks RESCORE_FACTOR * k candidates, which
+are then re-scored in float32 against the memory-mapped store, so only
+the candidate rows of the full-precision matrix are ever read.
+
+    python -m rag.quantize        # memory saved and ranking drift
+"""
+import argparse
+
+import numpy as np
+
+from rag.index import ExactIndex, _top_k
+
+STORAGE_MODES = ("float32", "float16", "int8")
+
+RESCORE_FACTOR = 4
+CHUNK_ROWS = 4096
+
+
+def quantize(embeddings, mode):
+    """Return (matrix, per-row scale or None) for `mode`."""
+    if mode == "float16":
+        return np.asarray(embeddings, dtype=np.float16), None
+
+    if mode == "int8":
+        n, dim = embeddings.shape
+        q = np.empty((n, dim), dtype=np.int8)
+        scale = np.empty(n, dtype=np.float32)
+
+        # Chunked so the float32 source is never fully copied
+        for start in range(0, n, CHUNK_ROWS):
+            block = np.asarray(embeddings[start:start + CHUNK_ROWS], dtype=np.float32)
+            s = np.abs(block).max(axis=1) / 127.0
+            s[s == 0] = 1.0
+            q[start:start + len(block)] = np.rint(block / s[:, None]).astype(np.int8)
+            scale[start:start + len(block)] = s
+
+        return q, scale
+
+    raise ValueError(f"Unknown storage mode: {mode!r} (expected one of {STORAGE_MODES})")
+
+
+class QuantizedIndex:
+    mode = "exact"
+
+    def __init__(self, embeddings, storage, rescore_factor=RESCORE_FACTOR):
+        self.embeddings = embeddings
+        self.storage = storage
+        self.rescore_factor = rescore_factor
+        self.codes, self.scale = quantize(embeddings, storage)
+
+    @property
+    def ntotal(self):
+        return self.codes.shape[0]
+
+    @property
+    def nbytes(self):
+        extra = 0 if self.scale is None else self.scale.nbytes
+        return self.codes.nbytes + extra
+
+    def _approx_scores(self, query, rows=None):
+        query = np.asarray(query, dtype=np.float32)
+        codes = self.codes if rows is None else self.codes[rows]
+        scale = None
+        if self.scale is not None:
+            scale = self.scale if rows is None else self.scale[rows]
+
+        out = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), CHUNK_ROWS):
+            block = codes[start:start + CHUNK_ROWS].astype(np.float32)
+            out[start:start + len(block)] = block @ query
+
+        if scale is not None:
+            out *= scale
+        return out
+
+    def search(self, query, k, mask=None):
+        rows = None if mask is None else np.flatnonzero(mask)
+
+        _, cand = _top_k(self._approx_scores(query, rows), k * self.rescore_factor)
+        if rows is not None:
+            cand = rows[cand]
+        cand = np.sort(cand)
+
+        # Full-precision re-score of the candidates only
+        exact = np.asarray(self.embeddings[cand], dtype=np.float32) @ query
+        scores, ids = _top_k(exact, k)
+        return scores, cand[ids]
+
+    def search_batch(self, queries, k, masks=None):
+        if masks is None:
+            masks = [None] * len(queries)
+        return [self.search(q, k, m) for q, m in zip(queries, masks)]
+
+    def save(self, path):
+        pass
+
+
+def benchmark(embeddings, queries, k=5, storages=STORAGE_MODES):
+    """
+    Compare each storage mode with plain float32 scoring.
+
+    Returns {storage: {"bytes", "saved_bytes", "overlap", "same_order"}}
+    where overlap is mean top-k overlap and same_order the fraction of
+    queries whose top-k ranking is identical.
+    """
+    reference = ExactIndex(np.asarray(embeddings, dtype=np.float32))
+    truth = [reference.search(q, k)[1].tolist() for q in queries]
+    full_bytes = reference.embeddings.nbytes
+
+    report = {}
+    for storage in storages:
+        if storage == "float32":
+            index, nbytes = reference, full_bytes
+        else:
+            index = QuantizedIndex(embeddings, storage)
+            nbytes = index.nbytes
+
+        overlap = same = 0
+        for q, expected in zip(queries, truth):
+            got = index.search(q, k)[1].tolist()
+            overlap += len(set(got) & set(expected)) / k
+            same += got == expected
+
+        report[storage] = {
+            "bytes": nbytes,
+            "saved_bytes": full_bytes - nbytes,
+            "overlap": overlap / len(queries),
+            "same_order": same / len(queries),
+        }
+
+    return report
+
+
+def main():
+    from rag import retriever
+
+    parser = argparse.ArgumentParser(description="Memory and ranking drift of quantised storage")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    retriever.load_data()
+    embeddings = retriever._embeddings
+
+    rng = np.random.default_rng(0)
+    rows = rng.choice(len(embeddings), size=min(args.queries, len(embeddings)), replace=False)
+    queries = np.asarray(embeddings[np.sort(rows)], dtype=np.float32)
+
+    print(f"top-{args.k} drift vs float32 over {len(queries)} queries")
+    for storage, r in benchmark(embeddings, queries, k=args.k).items():
+        print(
+            f"  {storage:<8} {r['bytes'] / 1e6:7.2f} MB  saved {r['saved_bytes'] / 1e6:6.2f} MB"
+            f"  overlap={r['overlap']:.3f}  same_order={r['same_order']:.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
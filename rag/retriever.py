@@ -1,51 +1,267 @@
-import json
+import argparse
+import os
+import time
 from pathlib import Path
-from sentence_transformers import SentenceTransformer, util
+
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+from rag.cache import LRUCache
+from rag.corpus import PUBLISHED_NAME, attach_corpus, load_corpus
+from rag.embedding_store import load_embeddings, store_dir
+from rag.filters import build_filter_index, filter_mask
+from rag.index import load_index
+from rag.lexical import bm25_search, exact_name_rows, load_lexical_index, rrf_fuse
+from rag.shared import SHARED_DIR, bundle_path, bundle_stamp
 
 DATA_PATH = Path("data/plant_ai_dataset_v2_native_state.json")
+# Columnar compiled form of DATA_PATH (see rag/corpus.py)
+CORPUS_DIR = Path("data/compiled")
+MODEL_NAME = "all-MiniLM-L6-v2"
+
+# "exact", "ivf" or "hnsw" (see rag/index.py)
+INDEX_MODE = os.environ.get("PLANTMATCH_INDEX", "exact")
+# "float32", "float16" or "int8" first-pass storage (see rag/quantize.py)
+STORAGE_MODE = os.environ.get("PLANTMATCH_STORAGE", "float32")
+# "semantic" (MiniLM only) or "hybrid" (MiniLM + BM25, rank-fused)
+RETRIEVAL_MODE = os.environ.get("PLANTMATCH_RETRIEVAL", "semantic")
+# Candidates taken from each ranking before hybrid fusion
+HYBRID_DEPTH = 50
+
+QUERY_CACHE_SIZE = 2048
+QUERY_CACHE_TTL = 24 * 3600     # seconds
+RESULT_CACHE_SIZE = 4096
+RESULT_CACHE_TTL = 3600         # seconds
 
 _model = None
 _plants = None
 _embeddings = None
+_index = None
+_filters = None
+_lexical = None
+_corpus_version = None
+_data_stamp = None
+
+# normalised query -> embedding
+_query_cache = LRUCache(QUERY_CACHE_SIZE, QUERY_CACHE_TTL)
+# (corpus version, query, state, native_only, top_k) -> (row ids, query embedding)
+_result_cache = LRUCache(RESULT_CACHE_SIZE, RESULT_CACHE_TTL)
+
+
+def normalize_query(query):
+    return " ".join(query.lower().split())
 
 
 def load_data():
-    global _model, _plants, _embeddings
+    global _model, _plants, _embeddings, _index, _filters, _lexical, _corpus_version, _data_stamp
 
     if _model is None:
-        _model = SentenceTransformer("all-MiniLM-L6-v2")
+        _model = SentenceTransformer(MODEL_NAME)
+
+    # Attach to the corpus published by a loader process when there is
+    # one (see rag/shared.py), otherwise read the JSON dataset.
+    shared = SHARED_DIR and bundle_path(SHARED_DIR, PUBLISHED_NAME)
+
+    # Reload when the dataset file / published bundle changes
+    stamp = bundle_stamp(SHARED_DIR, PUBLISHED_NAME) if shared else os.stat(DATA_PATH).st_mtime_ns
+    if _plants is None or stamp != _data_stamp:
+        if shared:
+            _plants, _embeddings, meta = attach_corpus(SHARED_DIR)
+            _corpus_version = meta["corpus_version"]
+        else:
+            # Memory-mapped columns; recompiled only when the JSON changes
+            _plants = load_corpus(DATA_PATH, CORPUS_DIR)
+
+            # Embeddings come from the on-disk store (memory-mapped); only
+            # plants whose text changed since the last build are re-encoded.
+            _corpus_version = _plants.version
+            _embeddings, _ = load_embeddings(
+                _plants, _model, MODEL_NAME, _corpus_version
+            )
+
+        _index = load_index(
+            INDEX_MODE, store_dir(MODEL_NAME), _embeddings, _corpus_version,
+            storage=STORAGE_MODE,
+        )
+        _filters = build_filter_index(_plants)
+        _lexical = load_lexical_index(
+            _plants, store_dir(MODEL_NAME), _corpus_version
+        )
+        _data_stamp = stamp
+
+        # Cached row ids refer to the old corpus
+        _result_cache.clear()
+
+
+def _encode_queries(queries):
+    """Embed queries, encoding only those not in the query cache."""
+    keys = [normalize_query(q) for q in queries]
+    embs = [_query_cache.get(k) for k in keys]
+
+    missing = [i for i, e in enumerate(embs) if e is None]
+    if missing:
+        fresh = _model.encode(
+            [keys[i] for i in missing], normalize_embeddings=True, batch_size=64
+        )
+        for i, e in zip(missing, fresh):
+            _query_cache.put(keys[i], e)
+            embs[i] = e
+
+    return np.stack(embs)
+
+
+def cache_stats():
+    """Hit/miss counters of the query-embedding and result caches."""
+    return {
+        "query_embeddings": _query_cache.stats(),
+        "results": _result_cache.stats(),
+    }
+
+
+def _name_hits(query, top_k, mask):
+    """
+    Fast path for queries that are exactly a plant's scientific or
+    common name: answered from the lexical index, no encoder call.
+    Remaining slots are filled with the plants closest to the matched
+    one, using its stored embedding as the query vector.
+    """
+    rows = exact_name_rows(_lexical, query, mask)[:top_k]
+
+    if rows and len(rows) < top_k:
+        query_emb = np.asarray(_embeddings[rows[0]], dtype=np.float32)
+        _, extra = _index.search(query_emb, top_k + len(rows), mask)
+        rows += [int(i) for i in extra if i >= 0 and int(i) not in rows][:top_k - len(rows)]
+
+    return rows
 
-    if _plants is None:
-        with open(DATA_PATH, "r", encoding="utf-8") as f:
-            _plants = json.load(f)
 
-        texts = [
-            f"{p['plant_name']} {p.get('common_name','')} {p.get('medicinal_uses','')}"
-            for p in _plants
-        ]
-        _embeddings = _model.encode(texts, convert_to_tensor=True)
+def _fuse(query, semantic_ids, top_k, mask):
+    _, lexical_ids = bm25_search(_lexical, query, HYBRID_DEPTH, mask)
+    return rrf_fuse([semantic_ids, lexical_ids], top_k)
 
 
-def retrieve(query, top_k=5, state=None, native_only=True):
+def retrieve(query, top_k=5, state=None, native_only=True, mode=None, with_embedding=False):
+    """
+    Plant records for `query`. With `with_embedding` returns
+    (records, query embedding); the embedding is None for exact name
+    hits, which are answered without the encoder.
+    """
     load_data()
+    mode = mode or RETRIEVAL_MODE
 
-    query_emb = _model.encode(query, convert_to_tensor=True)
-    scores = util.cos_sim(query_emb, _embeddings)[0]
+    key = (_corpus_version, normalize_query(query), state or None, bool(native_only), top_k, mode)
+    ids, query_emb = _result_cache.get(key, (None, None))
 
-    ranked = scores.argsort(descending=True)
+    if ids is None:
+        # Only rows passing the state / native filters are scored
+        mask = filter_mask(_filters, state=state, native_only=native_only)
+        ids = _name_hits(query, top_k, mask)
+
+        if not ids:
+            # Stored rows are L2-normalised, so inner product is the cosine score
+            query_emb = _encode_queries([query])[0]
+
+            if mode == "hybrid":
+                _, ids = _index.search(query_emb, max(top_k, HYBRID_DEPTH), mask)
+                ids = _fuse(query, ids, top_k, mask)
+            else:
+                _, ids = _index.search(query_emb, top_k, mask)
+
+        ids = tuple(int(i) for i in ids)
+        _result_cache.put(key, (ids, query_emb))
+
+    plants = [_plants[int(i)] for i in ids]
+    return (plants, query_emb) if with_embedding else plants
+
+
+def retrieve_batch(queries, filters=None, top_k=5):
+    """
+    Retrieve for many queries at once; same results as calling
+    retrieve() for each query.
+
+    `filters` is either one dict applied to every query or a list with
+    one dict per query. Each dict may hold "state", "native_only",
+    "top_k" and "mode" (defaults: no state, native only, `top_k`,
+    RETRIEVAL_MODE).
+    """
+    load_data()
+
+    if not queries:
+        return []
+
+    if filters is None:
+        filters = {}
+    if isinstance(filters, dict):
+        filters = [filters] * len(queries)
+
+    ks = [f.get("top_k", top_k) for f in filters]
+    masks = [
+        filter_mask(
+            _filters,
+            state=f.get("state"),
+            native_only=f.get("native_only", True),
+        )
+        for f in filters
+    ]
+
+    modes = [f.get("mode") or RETRIEVAL_MODE for f in filters]
+
+    results = [_name_hits(q, k, m) for q, k, m in zip(queries, ks, masks)]
+    todo = [i for i, ids in enumerate(results) if not ids]
+
+    if todo:
+        # One encoder call (cache misses only) and one matrix multiply
+        # for every query without an exact name hit
+        query_embs = _encode_queries([queries[i] for i in todo])
+        depth = max(max(ks), HYBRID_DEPTH if "hybrid" in modes else 0)
+        hits = _index.search_batch(query_embs, depth, [masks[i] for i in todo])
+
+        for i, (_, ids) in zip(todo, hits):
+            if modes[i] == "hybrid":
+                results[i] = _fuse(queries[i], ids[:max(ks[i], HYBRID_DEPTH)], ks[i], masks[i])
+            else:
+                results[i] = ids[:ks[i]]
+
+    return [[_plants[int(i)] for i in ids] for ids in results]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare retrieve() with retrieve_batch()")
+    parser.add_argument("queries", nargs="?", help="text file with one query per line")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--state", default=None)
+    args = parser.parse_args()
+
+    if args.queries:
+        with open(args.queries, "r", encoding="utf-8") as f:
+            queries = [line.strip() for line in f if line.strip()]
+    else:
+        queries = [
+            "Which native medicinal plants are good for cough in Kerala?",
+            "Low-maintenance native plants for balcony gardening",
+            "Plants that help biodiversity and absorb carbon",
+        ] * 100
+
+    filters = {"state": args.state, "top_k": args.top_k}
+    load_data()
 
-    results = []
-    for idx in ranked:
-        plant = _plants[int(idx)]
+    start = time.perf_counter()
+    looped = [retrieve(q, top_k=args.top_k, state=args.state) for q in queries]
+    loop_s = time.perf_counter() - start
 
-        if native_only and plant.get("origin_type") != "native":
-            continue
+    start = time.perf_counter()
+    batched = retrieve_batch(queries, filters)
+    batch_s = time.perf_counter() - start
 
-        if state and state not in plant.get("suitable_states", []):
-            continue
+    same = sum(
+        [p["plant_name"] for p in a] == [p["plant_name"] for p in b]
+        for a, b in zip(looped, batched)
+    )
+    print(f"{len(queries)} queries")
+    print(f"  retrieve loop   {len(queries) / loop_s:8.1f} queries/s")
+    print(f"  retrieve_batch  {len(queries) / batch_s:8.1f} queries/s")
+    print(f"  identical rankings: {same}/{len(queries)}")
 
-        results.append(plant)
-        if len(results) >= top_k:
-            break
 
-    return results
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Read-only data shared across server processes through mmap'd files.
+
+A loader process publishes array bundles into SHARED_DIR (ideally on
+tmpfs, e.g. /dev/shm/plantmatch); every worker attaches to them with
+np.load(mmap_mode="r"), so the pages live once in the page cache
+instead of once per process.
+
+Bundle layout (one folder per published version):
+
+    <name>-<version>/
+        meta.json
+        <array>.npy ...
+    <name> -> <name>-<version>      symlink, swapped atomically
+
+After each swap, older versions that no process has mapped any more
+are deleted (see prune_bundles); the one just replaced is always kept
+for workers that are still attaching to it.
+
+    python -m rag.shared publish --dir /dev/shm/plantmatch
+"""
+import argparse
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+SHARED_DIR = os.environ.get("PLANTMATCH_SHARED_DIR")
+KEEP_VERSIONS = 2       # the current version and the one it replaced
+
+
+def save_bundle(folder, name, arrays, meta):
+    """Write a bundle and point the `name` link at it. Returns its path."""
+    folder = Path(folder)
+    version = meta.get("version", "0")
+    target = folder / f"{name}-{version}"
+    tmp = folder / f".{name}-{version}.{os.getpid()}.tmp"
+
+    if tmp.exists():
+        shutil.rmtree(tmp)
+    tmp.mkdir(parents=True)
+
+    for key, arr in arrays.items():
+        np.save(tmp / f"{key}.npy", np.ascontiguousarray(arr))
+    with open(tmp / "meta.json", "w", encoding="utf-8") as f:
+        json.dump({**meta, "arrays": sorted(arrays)}, f)
+
+    if target.exists():
+        shutil.rmtree(tmp)
+    else:
+        os.replace(tmp, target)
+
+    # Swap the link atomically; workers that already attached keep their
+    # mappings of the previous version.
+    link = folder / name
+    tmp_link = folder / f".{name}.{os.getpid()}.link"
+    if tmp_link.is_symlink():
+        tmp_link.unlink()
+    os.symlink(target.name, tmp_link)
+    os.replace(tmp_link, link)
+
+    prune_bundles(folder, name)
+    return target
+
+
+def _mapped_files():
+    """Paths of files mmap'd by any process we can inspect, or None without /proc."""
+    if not os.path.exists("/proc/self/maps"):
+        return None
+
+    paths = set()
+    for maps in Path("/proc").glob("[0-9]*/maps"):
+        try:
+            with open(maps, "r", encoding="utf-8", errors="replace") as f:
+                for line in f:
+                    fields = line.split(None, 5)
+                    if len(fields) == 6:
+                        paths.add(fields[5].rstrip("\n"))
+        except OSError:
+            # Exited meanwhile, or another user's process
+            continue
+    return paths
+
+
+def prune_bundles(folder, name, keep=KEEP_VERSIONS):
+    """
+    Delete old versions of a bundle that no process has mapped. The
+    newest `keep` versions (by write time, the linked one first) are
+    never deleted. Unlinking a file another user's process still maps
+    is harmless: its pages stay valid until that process unmaps them.
+    Returns the deleted paths.
+    """
+    folder = Path(os.path.realpath(folder))
+    mapped = _mapped_files()
+    if mapped is None:
+        return []
+
+    current = Path(os.path.realpath(folder / name))
+    versions = [
+        p for p in folder.glob(f"{name}-*")
+        if p.is_dir() and not p.is_symlink() and p != current
+    ]
+    versions.sort(key=lambda p: p.stat().st_mtime, reverse=True)
+
+    removed = []
+    for path in versions[keep - 1:]:
+        prefix = f"{path}/"
+        if any(m.startswith(prefix) for m in mapped):
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+        removed.append(path)
+    return removed
+
+
+def bundle_path(folder, name):
+    path = Path(folder) / name
+    return path if (path / "meta.json").exists() else None
+
+
+def load_bundle(folder, name):
+    """Attach to a bundle: (dict of read-only mmap'd arrays, meta)."""
+    # Resolve the link once, so a concurrent swap cannot mix two versions
+    path = Path(os.path.realpath(Path(folder) / name))
+    with open(path / "meta.json", "r", encoding="utf-8") as f:
+        meta = json.load(f)
+
+    arrays = {
+        key: np.load(path / f"{key}.npy", mmap_mode="r")
+        for key in meta["arrays"]
+    }
+    return arrays, meta
+
+
+def bundle_stamp(folder, name):
+    """Changes whenever a new version of the bundle is published."""
+    return os.path.realpath(Path(folder) / name)
+
+
+def main():
+    from rag import retriever
+    from rag.corpus import publish_corpus
+
+    parser = argparse.ArgumentParser(description="Publish read-only data for worker processes")
+    parser.add_argument("command", choices=["publish"])
+    parser.add_argument("--dir", default=SHARED_DIR or "/dev/shm/plantmatch")
+    args = parser.parse_args()
+
+    # Load from the JSON dataset and embedding store, not from a
+    # previously published bundle
+    retriever.SHARED_DIR = None
+    retriever.load_data()
+
+    path = publish_corpus(
+        args.dir,
+        list(retriever._plants),
+        retriever._embeddings,
+        retriever._corpus_version,
+        retriever.MODEL_NAME,
+    )
+    print(f"Published corpus ({len(retriever._plants)} plants) to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+"""
+HTTP inference service for PlantMatch (FastAPI).
+
+    GET/POST /retrieve          query, top_k, state, native_only
+    GET      /recommend/{state} ?n=5
+    GET      /disease/{name}    ?limit=6
+    GET      /states, /diseases, /version, /stats
+
+Concurrent /retrieve requests are coalesced into micro-batches: the
+first request of a batch waits at most BATCH_WINDOW_MS for others (up
+to MAX_BATCH), then the whole batch goes through one retrieve_batch()
+call, i.e. one encoder call and one index search. Batches run on a
+single thread per process, so the next one fills while the current one
+is encoded. If a batch call fails, its requests are retried one by one,
+so only the request that caused the error gets it. top_k and n are
+1..MAX_TOP_K; limit is at least 1.
+
+/recommend and /disease are answered from the precomputed state table
+and disease index, so they need no model call at request time.
+
+    python service.py [--workers 2] [--batch-window-ms 5] [--max-batch 32]
+
+Each worker is a separate process with its own batcher; with
+PLANTMATCH_SHARED_DIR set they share the corpus and embeddings.
+app.py talks to the service when PLANTMATCH_SERVICE_URL is set.
+"""
+import argparse
+import asyncio
+import os
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Optional
+
+import uvicorn
+from fastapi import FastAPI, HTTPException, Query
+from pydantic import BaseModel, Field
+
+from ml.disease_index import load_disease_index
+from ml.forest import load_compiled_forest
+from ml.state_table import load_state_table
+from rag.corpus import load_corpus
+from rag.embedding_store import file_hash
+from rag.retriever import cache_stats, load_data, retrieve_batch
+from rag.shared import SHARED_DIR, bundle_path
+
+DATA_DIR = Path(os.environ.get("PLANTMATCH_DATA_DIR", "data"))
+DATA_FILE = DATA_DIR / "plant_ai_dataset_v2_native_state.json"
+PLANT_MODEL_FILE = DATA_DIR / "plant_recommendation_model.pkl"
+DISEASE_FILE = DATA_DIR / "plant_disease_support.json"
+COMPILED_DIR = SHARED_DIR or DATA_DIR / "compiled"
+
+WORKERS = int(os.environ.get("PLANTMATCH_SERVICE_WORKERS", "1"))
+BATCH_WINDOW_MS = float(os.environ.get("PLANTMATCH_BATCH_WINDOW_MS", "5"))
+MAX_BATCH = int(os.environ.get("PLANTMATCH_MAX_BATCH", "32"))
+MAX_TOP_K = 50
+
+
+class MicroBatcher:
+    """Collects concurrent submit() calls into one fn(items) call per batch."""
+
+    def __init__(self, fn, window_ms=BATCH_WINDOW_MS, max_batch=MAX_BATCH):
+        self.fn = fn
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.queue = None
+        self.task = None
+        self.batches = 0
+        self.items = 0
+        self.largest = 0
+        self.retried = 0
+        self.failed = 0
+
+    async def start(self):
+        self.queue = asyncio.Queue()
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        self.executor.shutdown()
+
+    async def submit(self, item):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((item, future))
+        return await future
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        batch = [await self.queue.get()]
+        deadline = loop.time() + self.window
+
+        while len(batch) < self.max_batch:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        # Whatever queued up meanwhile goes too, even with a zero window
+        while len(batch) < self.max_batch and not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            # Callers that went away (client disconnect) are dropped
+            batch = [(item, f) for item, f in batch if not f.done()]
+            if not batch:
+                continue
+
+            try:
+                results = await loop.run_in_executor(self.executor, self.fn, [item for item, _ in batch])
+            except Exception:
+                # One bad item must not fail the whole batch: run each alone
+                self.retried += len(batch)
+                for item, f in batch:
+                    await self._run_one(loop, item, f)
+            else:
+                for (_, f), result in zip(batch, results):
+                    if not f.done():
+                        f.set_result(result)
+
+            self.batches += 1
+            self.items += len(batch)
+            self.largest = max(self.largest, len(batch))
+
+    async def _run_one(self, loop, item, future):
+        try:
+            result = (await loop.run_in_executor(self.executor, self.fn, [item]))[0]
+        except Exception as e:
+            self.failed += 1
+            if not future.done():
+                future.set_exception(e)
+            return
+        if not future.done():
+            future.set_result(result)
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "requests": self.items,
+            "mean_batch": self.items / self.batches if self.batches else 0.0,
+            "largest_batch": self.largest,
+            "retried": self.retried,
+            "failed": self.failed,
+            "queued": self.queue.qsize() if self.queue else 0,
+            "window_ms": self.window * 1000,
+            "max_batch": self.max_batch,
+        }
+
+
+def _retrieve_many(items):
+    filters = [
+        {"state": r.state, "native_only": r.native_only, "top_k": r.top_k}
+        for r in items
+    ]
+    return retrieve_batch([r.query for r in items], filters)
+
+
+# ----------------------------------
+# Models and tables (same as app.py)
+# ----------------------------------
+resources = {}
+batcher = MicroBatcher(_retrieve_many)
+
+
+def load_plant_model():
+    if bundle_path(COMPILED_DIR, "forest"):
+        forest = load_compiled_forest(COMPILED_DIR)
+        return forest, forest.plant_type_encoder, forest.climate_zone_encoder, forest.meta["version"]
+
+    with open(PLANT_MODEL_FILE, "rb") as f:
+        bundle = pickle.load(f)
+    return bundle["model"], bundle["plant_type_encoder"], bundle["climate_zone_encoder"], file_hash(PLANT_MODEL_FILE)
+
+
+def load_resources():
+    # Retriever state (encoder, embeddings, index) is loaded up front so
+    # the first batch does not pay for it
+    load_data()
+
+    corpus = load_corpus(DATA_FILE, COMPILED_DIR)
+    model, plant_encoder, climate_encoder, model_hash = load_plant_model()
+    resources["corpus"] = corpus
+    resources["recommendations"] = load_state_table(
+        COMPILED_DIR, corpus, corpus.version, model_hash,
+        model, plant_encoder, climate_encoder
+    )
+    resources["diseases"] = load_disease_index(DISEASE_FILE, COMPILED_DIR)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    load_resources()
+    await batcher.start()
+    yield
+    await batcher.stop()
+
+
+app = FastAPI(title="PlantMatch", lifespan=lifespan)
+
+
+class RetrieveRequest(BaseModel):
+    query: str
+    top_k: int = Field(5, ge=1, le=MAX_TOP_K)
+    state: Optional[str] = None
+    native_only: bool = True
+
+
+@app.post("/retrieve")
+async def retrieve_post(request: RetrieveRequest):
+    if not request.query.strip():
+        raise HTTPException(status_code=422, detail="empty query")
+    return await batcher.submit(request)
+
+
+@app.get("/retrieve")
+async def retrieve_get(query: str, top_k: int = Query(5, ge=1, le=MAX_TOP_K), state: Optional[str] = None, native_only: bool = True):
+    return await retrieve_post(RetrieveRequest(query=query, top_k=top_k, state=state, native_only=native_only))
+
+
+@app.get("/recommend/{state}")
+def recommend(state: str, n: int = Query(5, ge=1, le=MAX_TOP_K)):
+    table = resources["recommendations"]
+    if state not in table.states:
+        raise HTTPException(status_code=404, detail=f"unknown state: {state}")
+
+    corpus = resources["corpus"]
+    return [{**corpus[row], "ml_score": score} for row, score in table.top(state, n)]
+
+
+@app.get("/disease/{name}")
+def disease(name: str, limit: Optional[int] = Query(None, ge=1)):
+    return resources["diseases"].lookup(name, limit=limit)
+
+
+@app.get("/version")
+def version():
+    return {"corpus_version": resources["corpus"].version}
+
+
+@app.get("/states")
+def states():
+    return resources["corpus"].states
+
+
+@app.get("/diseases")
+def diseases():
+    return resources["diseases"].diseases()
+
+
+@app.get("/stats")
+def stats():
+    return {"batcher": batcher.stats(), "caches": cache_stats()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the PlantMatch inference service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=WORKERS, help="server processes")
+    parser.add_argument("--batch-window-ms", type=float, default=BATCH_WINDOW_MS)
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH)
+    args = parser.parse_args()
+
+    # Worker processes import this module afresh and read these
+    os.environ["PLANTMATCH_BATCH_WINDOW_MS"] = str(args.batch_window_ms)
+    os.environ["PLANTMATCH_MAX_BATCH"] = str(args.max_batch)
+
+    uvicorn.run("service:app", host=args.host, port=args.port, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()